@@ -1,7 +1,9 @@
 import os
 from .nodes import NODE_CLASS_MAPPINGS as FFMPEG_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS as FFMPEG_DISPLAY_MAPPINGS
 from .node_logger import log_node_info, log_node_success, log_node_error, log_node_warning, log_node_debug
-from .ffmpeg_path_resolver import initialize_ffmpeg_path_and_log
+from .ffmpeg_path_resolver import start_background_resolution
+from .encode_jobs import register_routes as register_encode_job_routes
+from .instrumentation import register_routes as register_metrics_routes
 
 NODE_CLASS_MAPPINGS = {
     **FFMPEG_MAPPINGS,
@@ -22,6 +24,9 @@ __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
 PACKAGE_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
 INIT_LOG_PREFIX = "San4itosInit" 
 
-initialize_ffmpeg_path_and_log(PACKAGE_DIRECTORY)
+# Пошук ffmpeg не блокує запуск ComfyUI; вузли дочекаються результату при першому використанні
+start_background_resolution(PACKAGE_DIRECTORY)
+register_encode_job_routes()
+register_metrics_routes()
 
 log_node_info(INIT_LOG_PREFIX, "*** Custom Nodes from ComfyUI-san4itos Initialized ***")
@@ -0,0 +1,160 @@
+# batch_convert.py
+import glob
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from .node_logger import log_node_warning
+
+BATCH_LOG_PREFIX = "BatchConvert"
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".cache", "batch_manifest.json")
+# Найдавніше оновлені записи маніфесту відкидаються понад цю кількість
+MAX_MANIFEST_ENTRIES = 20000
+
+# Розширення файлів, які приймає пакетна конвертація
+VIDEO_EXTENSIONS = {".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi", ".gif", ".mpg", ".mpeg", ".ts", ".mts", ".flv", ".wmv"}
+
+_GLOB_CHARS = set("*?[")
+
+
+def _is_within(path, directory):
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Різні диски у Windows
+        return False
+
+
+def expand_input_paths(text, base_directory):
+    """
+    Рядки з шляхами або шаблонами glob ('**' - рекурсивно) відносно base_directory ->
+    (відсортований список відеофайлів без повторів, рядки без жодного файлу, рядки поза base_directory).
+    Як і LoadVideoByPath, вузол читає лише файли з папки input: шаблони, що виходять за її межі
+    (абсолютні шляхи, '~', '..', символьні посилання назовні), відхиляються. Порожні рядки та рядки з '#' пропускаються.
+    """
+    base_directory = os.path.realpath(base_directory)
+    files, unmatched, rejected, seen = [], [], [], set()
+    for line in (text or "").splitlines():
+        pattern = line.strip().strip('"')
+        if not pattern or pattern.startswith("#"):
+            continue
+        pattern = os.path.normpath(os.path.join(base_directory, pattern))
+        if not _is_within(pattern, base_directory):
+            rejected.append(line.strip())
+            continue
+        candidates = sorted(glob.glob(pattern, recursive=True)) if _GLOB_CHARS.intersection(pattern) else [pattern]
+        matches = [os.path.realpath(path) for path in candidates
+                   if os.path.isfile(path) and os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS]
+        outside = [path for path in matches if not _is_within(path, base_directory)]
+        if outside:
+            rejected.append(line.strip())
+            matches = [path for path in matches if path not in outside]
+        if not matches and not outside:
+            unmatched.append(line.strip())
+        for real_path in matches:
+            if real_path not in seen:
+                seen.add(real_path)
+                files.append(real_path)
+    return files, unmatched, rejected
+
+
+def output_paths_for(input_paths, output_folder, output_format):
+    """Детерміновані імена виходів (<ім'я джерела>.<формат>); однакові імена з різних папок отримують суфікс _2, _3..."""
+    used, outputs = set(), []
+    for path in input_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, counter = stem, 1
+        while name.lower() in used:
+            counter += 1
+            name = f"{stem}_{counter}"
+        used.add(name.lower())
+        outputs.append(os.path.join(output_folder, f"{name}.{output_format}"))
+    return outputs
+
+
+def plan_workers(job_count, max_workers=0, threads_per_job=0):
+    """
+    (кількість одночасних FFmpeg, потоків на кожен). 0 - автоматично: разом приблизно стільки
+    потоків, скільки ядер; за замовчуванням пріоритет має паралельність між файлами.
+    """
+    cpu_count = os.cpu_count() or 1
+    if max_workers <= 0:
+        max_workers = max(1, cpu_count // threads_per_job) if threads_per_job > 0 else cpu_count
+    workers = max(1, min(max_workers, job_count))
+    threads = threads_per_job if threads_per_job > 0 else max(1, cpu_count // workers)
+    return workers, threads
+
+
+def params_fingerprint(params):
+    return hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def _file_fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class BatchManifest:
+    """
+    Відбитки вже сконвертованих файлів у JSON: для кожного виходу - джерело, його mtime та розмір,
+    хеш параметрів і mtime та розмір самого виходу. Вихід актуальний, лише якщо збігається все.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = OrderedDict(json.load(f))
+            except (OSError, ValueError):
+                self._entries = OrderedDict()
+        return self._entries
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self._entries.items()), f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log_node_warning(BATCH_LOG_PREFIX, f"Could not write batch manifest: {e}")
+
+    def is_up_to_date(self, source_path, output_path, params_hash):
+        with self._lock:
+            entry = self._load().get(os.path.realpath(output_path))
+        if entry is None:
+            return False
+        try:
+            return (entry["source"] == source_path and entry["params"] == params_hash
+                    and entry["source_stat"] == _file_fingerprint(source_path)
+                    and entry["output_stat"] == _file_fingerprint(output_path))
+        except (OSError, KeyError):
+            return False
+
+    def record(self, source_path, output_path, params_hash):
+        try:
+            entry = {"source": source_path, "params": params_hash,
+                     "source_stat": _file_fingerprint(source_path), "output_stat": _file_fingerprint(output_path)}
+        except OSError:
+            return
+        with self._lock:
+            entries = self._load()
+            key = os.path.realpath(output_path)
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > MAX_MANIFEST_ENTRIES:
+                entries.popitem(last=False)
+            self._save()
+
+
+_MANIFEST = BatchManifest(MANIFEST_PATH)
+
+
+def get_batch_manifest():
+    return _MANIFEST
@@ -0,0 +1,247 @@
+# benchmark.py
+"""
+Бенчмарк конвеєра кадри -> відео.
+
+Запускається окремо від ComfyUI (модулі folder_paths та comfy.cli_args підміняються заглушками),
+потребує лише torch, numpy, Pillow та локальний ffmpeg. Кожен випадок виконується в окремому
+процесі, щоб пікове RSS не накопичувалось між випадками. Результат - JSON.
+
+Приклад:
+    python benchmark.py --resolutions 640x360,1920x1080 --frames 48,240 --strategies png,pipe,parallel
+"""
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
+PACKAGE_NAME = "san4itos_video_benchmark"
+
+STRATEGIES = {
+    # Назва: (вузол, параметри вузла)
+    "png": ("save", {"frame_transport": "png sequence"}),
+    "png_fast": ("save", {"frame_transport": "png sequence (fast)"}),
+    "bmp": ("save", {"frame_transport": "bmp sequence"}),
+    "ppm": ("save", {"frame_transport": "ppm sequence"}),
+    "tiff": ("save", {"frame_transport": "tiff sequence"}),
+    "raw_file": ("save", {"frame_transport": "raw file"}),
+    "pipe": ("save", {"frame_transport": "raw pipe"}),
+    "parallel": ("save", {"frame_transport": "raw pipe", "segment_workers": 0}),
+    # 10-бітний вихід: 16-бітні кадри (rgb48le) проти 8-бітних (rgb24) - ціна додаткової пропускної здатності
+    "pipe_10bit": ("save", {"frame_transport": "raw pipe", "pixel_format": "yuv420p10le", "input_bit_depth": "auto"}),
+    "pipe_10bit_8in": ("save", {"frame_transport": "raw pipe", "pixel_format": "yuv420p10le", "input_bit_depth": "8-bit"}),
+    "convert_compat": ("convert", {}),
+    # Прямий шлях: convert_direct завжди перекодовує, convert_remux може обійтися копіюванням потоку (smart copy)
+    "convert_direct": ("convert", {"smart_copy": False}),
+    "convert_remux": ("convert", {"smart_copy": True}),
+}
+
+
+def _install_comfy_stubs(output_dir):
+    """Мінімальні заглушки модулів ComfyUI, потрібних nodes.py."""
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.get_output_directory = lambda: output_dir
+    folder_paths.get_input_directory = lambda: output_dir
+    folder_paths.get_annotated_filepath = lambda name: os.path.join(output_dir, name)
+    folder_paths.filter_files_content_types = lambda files, content_types: files
+
+    def get_save_image_path(filename_prefix, out_dir, width=0, height=0):
+        counter = len(os.listdir(out_dir)) + 1
+        return out_dir, filename_prefix, counter, "", filename_prefix
+    folder_paths.get_save_image_path = get_save_image_path
+
+    cli_args = types.ModuleType("comfy.cli_args")
+    cli_args.args = types.SimpleNamespace(disable_metadata=False)
+    comfy = types.ModuleType("comfy")
+    comfy.cli_args = cli_args
+    sys.modules.update({"folder_paths": folder_paths, "comfy": comfy, "comfy.cli_args": cli_args})
+
+
+def _import_package():
+    spec = importlib.util.spec_from_file_location(PACKAGE_NAME, os.path.join(PACKAGE_DIRECTORY, "__init__.py"),
+                                                  submodule_search_locations=[PACKAGE_DIRECTORY])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return sys.modules[f"{PACKAGE_NAME}.nodes"]
+
+
+class _DiskSampler:
+    """Періодично вимірює розмір тимчасової директорії та зберігає пікове значення."""
+
+    def __init__(self, path, interval=0.02):
+        self.path, self.interval = path, interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _size(self):
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._size())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _run_case(case):
+    """Виконує один випадок у поточному процесі та повертає словник результатів."""
+    import torch
+
+    work_dir = tempfile.mkdtemp(prefix="san4itos_bench_")
+    output_dir = os.path.join(work_dir, "output")
+    temp_root = os.path.join(work_dir, "tmp")
+    os.makedirs(output_dir); os.makedirs(temp_root)
+    _install_comfy_stubs(output_dir)
+    nodes = _import_package()
+
+    width, height = case["width"], case["height"]
+    torch.manual_seed(0)
+    # Плавний градієнт з шумом - ближче до реальних кадрів, ніж чистий шум
+    base = torch.linspace(0, 1, width).repeat(height, 1)
+    images = torch.stack([(base + 0.05 * i / case["frames"]).unsqueeze(-1).repeat(1, 1, 3) for i in range(case["frames"])])
+    images = (images + 0.02 * torch.rand_like(images)).clamp(0, 1)
+    audio = None
+    if case["audio"]:
+        samples = int(48000 * case["frames"] / case["fps"])
+        audio = {"waveform": 0.1 * torch.randn(1, 2, samples), "sample_rate": 48000}
+
+    # Час етапів береться з вбудованих метрик вузлів (instrumentation.py)
+    instrumentation = sys.modules[f"{PACKAGE_NAME}.instrumentation"]
+    metrics = instrumentation.add_sink(instrumentation.RingBufferSink(16))
+
+    strategy = case["strategy"]
+    node_kind, node_kwargs = STRATEGIES[strategy]
+    node_kwargs = dict(node_kwargs)
+    if node_kwargs.get("segment_workers") == 0:
+        node_kwargs["segment_workers"] = max(2, os.cpu_count() or 1)
+        node_kwargs["segment_length"] = max(1, case["frames"] // node_kwargs["segment_workers"])
+    codec_kwargs = {"codec": case["codec"], "pixel_format": "yuv420p", "crf": 23, "output_format": "mp4",
+                    "output_file_opt": f"-preset {case['preset']}"}
+
+    video = None
+    if node_kind == "convert":
+        if strategy != "convert_compat":
+            # Вхідний файл для прямого шляху створюється заздалегідь і не входить у вимірювання
+            nodes.SaveFramesToVideoFFmpeg().save_video(images, "source", case["fps"], audio=audio, **codec_kwargs)
+            video = nodes.VideoPathWrapper(os.path.join(output_dir, sorted(os.listdir(output_dir))[-1]))
+        else:
+            video = types.SimpleNamespace(get_components=lambda: types.SimpleNamespace(images=images, audio=audio, frame_rate=case["fps"]))
+
+    tempfile.tempdir = temp_root
+    with _DiskSampler(temp_root) as disk:
+        start = time.perf_counter()
+        if node_kind == "save":
+            result = nodes.SaveFramesToVideoFFmpeg().save_video(images, "bench", case["fps"], audio=audio, **{**codec_kwargs, **node_kwargs})
+        else:
+            result = nodes.ConvertVideoFFmpeg().convert_video(video, "bench", audio_handling="copy original", **{**codec_kwargs, **node_kwargs})
+        elapsed = time.perf_counter() - start
+    tempfile.tempdir = None
+
+    run_record = metrics.records()[-1] if metrics.records() else {}
+    outputs = [os.path.join(output_dir, v["filename"]) for v in result.get("ui", {}).get("videos", [])]
+    output_bytes = sum(os.path.getsize(p) for p in outputs if os.path.exists(p))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        **case,
+        "ok": bool(outputs),
+        "error": None if outputs else result.get("ui", {}).get("text"),
+        "seconds": round(elapsed, 4),
+        "frames_per_sec": round(case["frames"] / elapsed, 2) if elapsed > 0 else None,
+        # ru_maxrss на Linux - у кілобайтах
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_temp_disk_bytes": disk.peak_bytes,
+        "output_bytes": output_bytes,
+        "stages": {name: round(seconds, 4) for name, seconds in sorted(run_record.get("stages", {}).items())},
+        "ffmpeg_speed": run_record.get("ffmpeg_speed"),
+    }
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the frame-to-video pipeline.")
+    parser.add_argument("--resolutions", default="640x360,1280x720", help="Comma-separated WxH list.")
+    parser.add_argument("--frames", default="48,240", help="Comma-separated frame counts.")
+    parser.add_argument("--strategies", default="png,pipe,parallel,convert_compat,convert_direct",
+                        help=f"Comma-separated subset of: {', '.join(STRATEGIES)}.")
+    parser.add_argument("--audio", choices=["with", "without", "both"], default="both")
+    parser.add_argument("--fps", type=float, default=24.0)
+    parser.add_argument("--codec", default="libx264")
+    parser.add_argument("--preset", default="ultrafast")
+    parser.add_argument("--ffmpeg", default=None, help="Path to the ffmpeg binary (prepended to PATH).")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = _parse_args(argv if argv is not None else sys.argv[1:])
+    if options.ffmpeg:
+        os.environ["PATH"] = os.path.dirname(os.path.abspath(options.ffmpeg)) + os.pathsep + os.environ.get("PATH", "")
+
+    if options.case:
+        # Дочірній процес: один випадок, результат - останній рядок stdout
+        result = _run_case(json.loads(options.case))
+        sys.stdout.write("\n" + json.dumps(result) + "\n")
+        return 0
+
+    cases = []
+    for resolution in options.resolutions.split(","):
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        for frames in (int(v) for v in options.frames.split(",")):
+            for audio in ([True, False] if options.audio == "both" else [options.audio == "with"]):
+                for strategy in options.strategies.split(","):
+                    if strategy not in STRATEGIES:
+                        raise SystemExit(f"Unknown strategy '{strategy}'.")
+                    cases.append({"strategy": strategy, "width": width, "height": height, "frames": frames,
+                                  "audio": audio, "fps": options.fps, "codec": options.codec, "preset": options.preset})
+
+    results = []
+    for case in cases:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+                              capture_output=True, text=True, env=os.environ)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode == 0 and lines:
+            results.append(json.loads(lines[-1]))
+        else:
+            results.append({**case, "ok": False, "error": proc.stderr.strip().splitlines()[-1:] or "benchmark process failed"})
+        sys.stderr.write(f"{case['strategy']:>15} {case['width']}x{case['height']} x{case['frames']} audio={case['audio']}: "
+                         f"{results[-1].get('frames_per_sec')} fps\n")
+
+    try:
+        ffmpeg_version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        ffmpeg_version = None
+    report = json.dumps({"ffmpeg": ffmpeg_version, "cpu_count": os.cpu_count(), "results": results}, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+# encode_jobs.py
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from .node_config import get_config_int
+from .node_logger import log_node_info, log_node_success, log_node_error
+
+JOBS_LOG_PREFIX = "EncodeJobs"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Скільки завершених задач зберігати для запитів статусу
+MAX_FINISHED_JOBS = 200
+
+_thread_state = threading.local()
+
+
+def current_job():
+    """Повертає задачу, яку виконує поточний потік (або None для синхронного кодування)."""
+    return getattr(_thread_state, "job", None)
+
+
+@contextmanager
+def attached_job(job):
+    """Прив'язує задачу (або її частину, див. CombinedProgress) до поточного (робочого) потоку."""
+    previous = current_job()
+    _thread_state.job = job
+    try:
+        yield job
+    finally:
+        _thread_state.job = previous
+
+
+class CombinedProgress:
+    """
+    Прогрес задачі, яку кодують кілька процесів FFmpeg паралельно (сегменти). Кожен процес
+    рахує кадри від нуля, тож у задачу передається сума кадрів усіх частин.
+    """
+
+    def __init__(self, job, parts):
+        self.job = job
+        self._frames = [0] * parts
+        self._ended = [False] * parts
+        self._lock = threading.Lock()
+
+    def part(self, index):
+        return _ProgressPart(self, index)
+
+    def _update(self, index, values):
+        with self._lock:
+            frame = values.get("frame", "")
+            if frame.isdigit(): self._frames[index] = int(frame)
+            self._ended[index] = values.get("progress") == "end"
+            combined = dict(values, frame=str(sum(self._frames)), progress="end" if all(self._ended) else "continue")
+        self.job.update_progress(combined)
+
+
+class _ProgressPart:
+    def __init__(self, combined, index):
+        self._combined = combined
+        self._index = index
+
+    def update_progress(self, values):
+        self._combined._update(self._index, values)
+
+
+class EncodeJob:
+    def __init__(self, label, total_frames=None, outputs=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.total_frames = total_frames
+        self.outputs = outputs or []
+        self.status = STATUS_QUEUED
+        self.progress = {}
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update_progress(self, values):
+        """Оновлює прогрес зі знімка, отриманого з виводу FFmpeg -progress."""
+        with self._lock:
+            self.progress = dict(values)
+
+    def to_dict(self):
+        with self._lock:
+            progress = dict(self.progress)
+        result = {
+            "job_id": self.job_id,
+            "label": self.label,
+            "status": self.status,
+            "progress": progress,
+            "total_frames": self.total_frames,
+            "outputs": self.outputs,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        frame = progress.get("frame")
+        if self.total_frames and frame and frame.isdigit():
+            result["percent"] = min(100.0, 100.0 * int(frame) / self.total_frames)
+        return result
+
+
+class EncodeJobManager:
+    """
+    Фонова черга задач кодування з обмеженням кількості одночасних процесів FFmpeg.
+    Вузол передає задачу і одразу повертається, а статус можна отримати через get/list_jobs.
+    """
+
+    def __init__(self, max_concurrent_jobs):
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        # Потоки-демони: незавершені задачі не блокують вихід з ComfyUI
+        for i in range(self.max_concurrent_jobs):
+            threading.Thread(target=self._worker, name=f"san4itos_encode_{i}", daemon=True).start()
+
+    def _worker(self):
+        while True:
+            job, encode_fn = self._queue.get()
+            self._run(job, encode_fn)
+
+    def submit(self, label, encode_fn, total_frames=None, outputs=None):
+        """
+        encode_fn() виконується у фоновому потоці і повертає None при успіху
+        або словник помилки у форматі вузлів ({"ui": {"text": [...]}}).
+        """
+        job = EncodeJob(label, total_frames, outputs)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim_finished()
+        self._queue.put((job, encode_fn))
+        log_node_info(JOBS_LOG_PREFIX, f"Queued encode job {job.job_id} ({label}).")
+        return job
+
+    def _run(self, job, encode_fn):
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        _thread_state.job = job
+        try:
+            error = encode_fn()
+            if error:
+                job.error = "; ".join(error.get("ui", {}).get("text", [])) or "Unknown error"
+                job.status = STATUS_FAILED
+            else:
+                job.status = STATUS_DONE
+        except Exception as e:
+            job.error = f"Python error: {e}"
+            job.status = STATUS_FAILED
+        finally:
+            _thread_state.job = None
+            job.finished_at = time.time()
+
+        if job.status == STATUS_DONE:
+            log_node_success(JOBS_LOG_PREFIX, f"Encode job {job.job_id} ({job.label}) finished in {job.finished_at - job.started_at:.1f}s.")
+        else:
+            log_node_error(JOBS_LOG_PREFIX, f"Encode job {job.job_id} ({job.label}) failed: {job.error}")
+
+    def _trim_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (STATUS_DONE, STATUS_FAILED)]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list_jobs(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        summary = {status: 0 for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)}
+        for job in jobs:
+            summary[job.status] += 1
+        return {"summary": summary, "jobs": [job.to_dict() for job in jobs]}
+
+
+_JOB_MANAGER = None
+_JOB_MANAGER_LOCK = threading.Lock()
+
+
+def get_encode_job_manager():
+    global _JOB_MANAGER
+    with _JOB_MANAGER_LOCK:
+        if _JOB_MANAGER is None:
+            _JOB_MANAGER = EncodeJobManager(get_config_int("PERFORMANCE", "async_encode_jobs", 1))
+        return _JOB_MANAGER
+
+
+def register_routes():
+    """Реєструє HTTP маршрути статусу задач у сервері ComfyUI (якщо він доступний)."""
+    try:
+        from aiohttp import web
+        from server import PromptServer
+        routes = PromptServer.instance.routes
+    except Exception:
+        return False
+
+    @routes.get("/san4itos/encode_jobs")
+    async def list_encode_jobs(request):
+        return web.json_response(get_encode_job_manager().list_jobs())
+
+    @routes.get("/san4itos/encode_jobs/{job_id}")
+    async def get_encode_job(request):
+        job = get_encode_job_manager().get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "job not found"}, status=404)
+        return web.json_response(job)
+
+    return True
@@ -0,0 +1,135 @@
+# encode_session.py
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from .node_config import get_config_int, get_temp_root
+from .node_logger import log_node_info, log_node_warning
+
+SESSION_LOG_PREFIX = "EncodeSession"
+
+STATE_OPEN = "open"
+STATE_FINALIZED = "finalized"
+STATE_ABORTED = "aborted"
+
+
+class EncodeSessionHandle:
+    """
+    Об'єкт, що передається між вузлами (тип ENCODE_SESSION). Містить лише ідентифікатор,
+    сама сесія з процесом FFmpeg живе в реєстрі модуля між запусками вузлів.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+    def __repr__(self):
+        return f"EncodeSessionHandle({self.session_id})"
+
+
+class EncodeSession:
+    """
+    Процес FFmpeg, що залишається відкритим між викликами вузлів: кадри дописуються в його stdin
+    батчами, тож у пам'яті одночасно тримається лише поточний батч. Відео пишеться в проміжний
+    mkv без аудіо; аудіо та метадані додаються при завершенні сесії без перекодування відео.
+    """
+
+    def __init__(self, settings, output_path):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.settings = dict(settings)
+        self.output_path = output_path
+        self.temp_dir = tempfile.mkdtemp(prefix="san4itos_session_", dir=get_temp_root())
+        self.video_path = os.path.join(self.temp_dir, "video.mkv")
+        self.frame_shape = None
+        self.frames_written = 0
+        self.state = STATE_OPEN
+        self.last_used = time.time()
+        self.process = None
+        self._stderr_chunks = []
+        self._stderr_reader = None
+        self.lock = threading.Lock()
+
+    def start(self, ffmpeg_cmd, frame_shape):
+        self.frame_shape = tuple(frame_shape)
+        log_node_info(SESSION_LOG_PREFIX, f"Session {self.session_id}: executing ffmpeg: {' '.join(ffmpeg_cmd)}")
+        self.process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # stderr читається постійно, інакше FFmpeg заблокується на переповненому каналі
+        self._stderr_reader = threading.Thread(target=lambda: self._stderr_chunks.append(self.process.stderr.read()), daemon=True)
+        self._stderr_reader.start()
+
+    def write(self, chunks):
+        """Записує шматки кадрів (uint8 або uint16 масиви) у stdin FFmpeg. Повертає кількість записаних кадрів."""
+        written = 0
+        for chunk in chunks:
+            self.process.stdin.write(memoryview(chunk).cast('B'))
+            written += len(chunk)
+        self.frames_written += written
+        self.last_used = time.time()
+        return written
+
+    def stderr_text(self):
+        return b"".join(self._stderr_chunks).decode('utf-8', errors='replace')
+
+    def close_video(self):
+        """Закриває stdin і чекає на FFmpeg. Повертає код завершення."""
+        if self.process is None:
+            return None
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        self._stderr_reader.join()
+        return self.process.returncode
+
+    def abort(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.close_video()
+        self.state = STATE_ABORTED
+        self.cleanup()
+        # Видаляємо порожню заглушку вихідного файлу
+        if os.path.exists(self.output_path) and os.path.getsize(self.output_path) == 0:
+            os.remove(self.output_path)
+
+    def cleanup(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _abort_idle_sessions():
+    """Перериває сесії, до яких не зверталися довше за session_idle_timeout (0 - ніколи)."""
+    timeout = get_config_int("PERFORMANCE", "session_idle_timeout", 3600)
+    if timeout <= 0:
+        return
+    now = time.time()
+    idle = [session for session in _SESSIONS.values() if now - session.last_used > timeout]
+    for session in idle:
+        log_node_warning(SESSION_LOG_PREFIX, f"Session {session.session_id} was idle for more than {timeout}s. Aborting.")
+        del _SESSIONS[session.session_id]
+        session.abort()
+
+
+def open_session(settings, output_path):
+    with _SESSIONS_LOCK:
+        _abort_idle_sessions()
+        session = EncodeSession(settings, output_path)
+        _SESSIONS[session.session_id] = session
+    log_node_info(SESSION_LOG_PREFIX, f"Opened session {session.session_id} -> {output_path}")
+    return EncodeSessionHandle(session.session_id)
+
+
+def get_session(handle):
+    """Сесія за дескриптором або None, якщо її вже завершено чи перервано."""
+    with _SESSIONS_LOCK:
+        return _SESSIONS.get(getattr(handle, "session_id", None))
+
+
+def close_session(handle):
+    with _SESSIONS_LOCK:
+        return _SESSIONS.pop(getattr(handle, "session_id", None), None)
@@ -0,0 +1,216 @@
+# ffmpeg_args.py
+import re
+import shlex
+from .node_logger import log_node_error, log_node_warning
+from .video_filters import chain_filters
+
+# Параметри FFmpeg без значення. Для решти наступний токен завжди вважається значенням
+VALUELESS_FLAGS = {
+    "-y", "-n", "-an", "-vn", "-sn", "-dn", "-shortest", "-nostdin", "-stdin", "-hide_banner",
+    "-stats", "-nostats", "-copyts", "-start_at_zero", "-re", "-benchmark", "-benchmark_all",
+    "-ignore_unknown", "-copy_unknown", "-xerror", "-accurate_seek", "-noaccurate_seek",
+    "-autorotate", "-noautorotate", "-autoscale", "-noautoscale", "-dump", "-hex", "-debug_ts",
+    "-fix_sub_duration", "-vstats", "-bitexact", "-psnr", "-qphist", "-copyinkf", "-intra", "-recast_media",
+    "-find_stream_info", "-print_graphs", "-report",
+}
+
+# Параметри, які можна вказати кілька разів; для -metadata унікальним є ключ (title=..., comment=...)
+REPEATABLE_FLAGS = {"-map", "-attach", "-metadata", "-map_metadata"}
+# Повторювані параметри, перше входження яких у параметрах користувача прибирає всі вбудовані
+# (наприклад, '-map_metadata -1' має вимкнути метадані, а не додатися до вбудованих відображень)
+USER_REPLACES_FLAGS = {"-map_metadata"}
+
+# Параметри рівня виходу/муксера: при паралельних сегментах вони належать фінальному муксуванню,
+# а не кодуванню окремих сегментів (разом з усіма параметрами аудіопотоків, див. split_mux_options)
+MUX_LEVEL_FLAGS = {
+    "-movflags", "-metadata", "-map_metadata", "-map_chapters", "-map", "-attach", "-disposition", "-brand",
+    "-f", "-t", "-to", "-fs", "-shortest", "-tag", "-fflags", "-avoid_negative_ts", "-max_muxing_queue_size",
+    "-muxdelay", "-muxpreload", "-write_tmcd", "-use_editlist", "-frag_duration", "-frag_size", "-min_frag_duration",
+    "-ar", "-ac", "-an", "-sample_fmt", "-channel_layout",
+}
+
+# Синоніми -> канонічна форма з явним специфікатором потоку
+_ALIASES = {"-vcodec": "-c:v", "-acodec": "-c:a", "-scodec": "-c:s", "-dcodec": "-c:d", "-vf": "-filter:v", "-af": "-filter:a",
+            "-vb": "-b:v", "-ab": "-b:a", "-vframes": "-frames:v", "-aframes": "-frames:a", "-dframes": "-frames:d",
+            "-vtag": "-tag:v", "-atag": "-tag:a"}
+_LONG_NAMES = {"codec": "c", "qscale": "q", "bitrate": "b"}
+
+# Токен схожий на параметр: "-name", але не від'ємне число ("-1", "-0.5")
+_FLAG_PATTERN = re.compile(r"^-[A-Za-z_]")
+
+
+def canonical_flag(flag):
+    """'-vcodec' -> '-c:v', '-codec:a:0' -> '-c:a:0', '-vf' -> '-filter:v'. Інші параметри без змін."""
+    flag = _ALIASES.get(flag, flag)
+    name, sep, specifier = flag[1:].partition(":")
+    name = _LONG_NAMES.get(name, name)
+    return f"-{name}:{specifier}" if sep else f"-{name}"
+
+
+def _option_key(flag, value):
+    """Ключ, за яким параметр користувача замінює попередній; None - параметр лише додається."""
+    canonical = canonical_flag(flag)
+    base_name = canonical.split(":", 1)[0]
+    if base_name == "-metadata":
+        return canonical, str(value).partition("=")[0]
+    if base_name in REPEATABLE_FLAGS:
+        return None
+    return canonical, None
+
+
+def parse_options(text, log_prefix):
+    """
+    Розбирає рядок параметрів (shlex) у список пар (прапорець, значення або None).
+    Як і в FFmpeg, прапорець поза VALUELESS_FLAGS завжди забирає наступний токен як значення,
+    навіть якщо той починається з '-' ('-flags -global_header', '-itsoffset -0.5').
+    Такий прапорець у кінці рядка пропускається з попередженням.
+    """
+    try:
+        tokens = shlex.split(text or "")
+    except ValueError as e:
+        log_node_error(log_prefix, f"Error parsing override parameters: {e}. Ignoring overrides.")
+        return []
+    return _pair_tokens(tokens, log_prefix)
+
+
+def _pair_tokens(tokens, log_prefix):
+    options = []
+    index = 0
+    while index < len(tokens):
+        flag = tokens[index]
+        index += 1
+        if not _FLAG_PATTERN.match(flag):
+            log_node_warning(log_prefix, f"Unexpected token '{flag}' in override parameters. Should be a flag starting with '-'. Ignoring.")
+            continue
+        if flag in VALUELESS_FLAGS:
+            options.append((flag, None))
+        elif index < len(tokens):
+            options.append((flag, tokens[index]))
+            index += 1
+        else:
+            log_node_warning(log_prefix, f"Flag '{flag}' provided without a value. Ignoring.")
+    return options
+
+
+def option_flags(text):
+    """Канонічні назви прапорців з рядка параметрів (без логування; некоректний рядок - порожня множина)."""
+    try:
+        tokens = shlex.split(text or "")
+    except ValueError:
+        return set()
+    flags = set()
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+        if _FLAG_PATTERN.match(token):
+            flags.add(canonical_flag(token))
+            if token not in VALUELESS_FLAGS:
+                index += 1
+    return flags
+
+
+def split_mux_options(args, log_prefix):
+    """
+    Ділить готовий список параметрів виходу (результат build_output_args) на параметри кодування відео
+    та параметри фінального муксування (MUX_LEVEL_FLAGS і все зі специфікатором аудіо: -c:a, -b:a, -filter:a...).
+    Повертає два списки пар (прапорець, значення) для build_output_args.
+    """
+    encoder_options, mux_options = [], []
+    for flag, value in _pair_tokens(args, log_prefix):
+        name, _, specifier = canonical_flag(flag)[1:].partition(":")
+        is_mux = f"-{name}" in MUX_LEVEL_FLAGS or specifier.split(":", 1)[0] == "a"
+        (mux_options if is_mux else encoder_options).append((flag, value))
+    return encoder_options, mux_options
+
+
+class FFmpegArgs:
+    """
+    Впорядкований набір параметрів виходу FFmpeg. Порядок додавання зберігається; параметр з тим самим
+    ключем (канонічний прапорець зі специфікатором потоку) замінюється на місці, повторювані
+    параметри (-map, -metadata з різними ключами) додаються.
+    """
+
+    def __init__(self, params=None):
+        self._items = []
+        for flag, value in (params.items() if isinstance(params, dict) else params or ()):
+            self.set(flag, value)
+
+    def _index(self, key):
+        for i, (flag, value) in enumerate(self._items):
+            if key is not None and _option_key(flag, value) == key:
+                return i
+        return None
+
+    def get(self, flag):
+        index = self._index(_option_key(flag, None))
+        return None if index is None else self._items[index][1]
+
+    def __contains__(self, flag):
+        return self._index(_option_key(flag, None)) is not None
+
+    def set(self, flag, value=None):
+        """Додає параметр або замінює значення наявного. Повертає попереднє значення або None."""
+        value = None if value is None else str(value)
+        index = self._index(_option_key(flag, value))
+        if index is None:
+            self._items.append((flag, value))
+            return None
+        previous = self._items[index][1]
+        self._items[index] = (flag, value)
+        return previous
+
+    def remove(self, flag):
+        index = self._index(_option_key(flag, None))
+        return None if index is None else self._items.pop(index)[1]
+
+    def merge(self, options, log_prefix):
+        """
+        Додає параметри користувача. Вони мають вищий пріоритет, за винятком фільтрів відео:
+        граф користувача дописується після вбудованого '-vf', а не замінює його.
+        """
+        builtin_filters = self.get("-vf")
+        replaced = set()
+        for flag, value in options:
+            key = _option_key(flag, value)
+            base_name = canonical_flag(flag).split(":", 1)[0]
+            if base_name in USER_REPLACES_FLAGS and base_name not in replaced:
+                replaced.add(base_name)
+                builtin = [item for item in self._items if canonical_flag(item[0]).split(":", 1)[0] == base_name]
+                if builtin:
+                    log_node_warning(log_prefix, f"Overriding GUI parameter '{flag}' with value '{value}' (was '{' '.join(str(v) for _, v in builtin)}').")
+                    self._items = [item for item in self._items if item not in builtin]
+            if key == ("-filter:v", None) and builtin_filters is not None:
+                combined = chain_filters([builtin_filters], value)
+                if combined is None:
+                    log_node_warning(log_prefix, f"Cannot chain '{value}' after the built-in filters '{builtin_filters}' (graph starts with a label). Using the custom graph only.")
+                    combined = value
+                self.set("-vf", combined)
+                continue
+            index = self._index(key)
+            if index is not None and value is not None and self._items[index][1] != value:
+                log_node_warning(log_prefix, f"Overriding GUI parameter '{flag}' with value '{value}' (was '{self._items[index][1]}').")
+            if key is None:
+                self._items.append((flag, value))
+            else:
+                self.set(flag, value)
+        if builtin_filters is not None and "-filter_complex" in self:
+            # FFmpeg не дозволяє простий і складний граф для одного потоку
+            log_node_warning(log_prefix, f"'-filter_complex' cannot be combined with '-vf'. Dropping '-vf {self.remove('-vf')}'.")
+        return self
+
+    def to_list(self):
+        result = []
+        for flag, value in self._items:
+            result.append(flag)
+            if value is not None: result.append(value)
+        return result
+
+
+def build_output_args(base_params, override, log_prefix):
+    """
+    Параметри з GUI (base_params) + параметри користувача з output_file_opt -> список для subprocess.
+    override - рядок або вже розібраний список пар (наприклад, з split_mux_options).
+    """
+    options = override if isinstance(override, list) else parse_options(override, log_prefix)
+    return FFmpegArgs(base_params).merge(options, log_prefix).to_list()
@@ -0,0 +1,200 @@
+# ffmpeg_capabilities.py
+import json
+import os
+import shutil
+import subprocess
+import threading
+from .ffmpeg_args import option_flags
+from .node_logger import log_node_debug, log_node_warning
+
+CAPABILITIES_LOG_PREFIX = "FFmpegCapabilities"
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".cache")
+CACHE_FILE_PATH = os.path.join(CACHE_DIRECTORY, "ffmpeg_capabilities.json")
+
+# Відповідність output_format вузлів назвам муксерів FFmpeg
+FORMAT_TO_MUXER = {"mp4": "mp4", "webm": "webm", "mov": "mov", "avi": "avi", "mkv": "matroska"}
+
+_MEMORY_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _binary_key(ffmpeg_path):
+    """Ключ кешу: абсолютний шлях, mtime та розмір файлу. None, якщо файл не знайдено."""
+    resolved = shutil.which(ffmpeg_path) or ffmpeg_path
+    try:
+        stat = os.stat(resolved)
+    except OSError:
+        return None
+    return f"{os.path.realpath(resolved)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def _run_ffmpeg(ffmpeg_path, *args):
+    result = subprocess.run([ffmpeg_path, '-hide_banner', *args], capture_output=True, text=True,
+                            encoding='utf-8', errors='replace', timeout=15)
+    return result.stdout
+
+
+def _table_rows(output, separator_prefix):
+    """Рядки таблиці після рядка-розділювача (' ------' або ' --')."""
+    lines = output.splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().startswith(separator_prefix):
+            return [row.split() for row in lines[i + 1:] if row.strip()]
+    return []
+
+
+def _parse_encoders(output):
+    # " V....D libx264   libx264 H.264 / AVC ..." -> {"libx264": "V"}
+    return {row[1]: row[0][0] for row in _table_rows(output, "------") if len(row) >= 2}
+
+
+def _parse_encoder_codecs(output):
+    """
+    Назви кодеків, для яких є енкодер: FFmpeg приймає у -c:v/-c:a і їх ('-c:a mp3' -> libmp3lame).
+    " A....D libmp3lame  libmp3lame MP3 (MPEG audio layer 3) (codec mp3)" -> {"mp3": "A"};
+    без "(codec ...)" назва енкодера збігається з назвою кодека.
+    """
+    codecs = {}
+    for row in _table_rows(output, "------"):
+        if len(row) < 2: continue
+        name = row[-1][:-1] if len(row) >= 4 and row[-2] == "(codec" and row[-1].endswith(")") else row[1]
+        codecs.setdefault(name, row[0][0])
+    return codecs
+
+
+def _parse_pix_fmts(output):
+    # "IO... yuv420p   3   12   8-8-8"
+    return sorted(row[1] for row in _table_rows(output, "-----") if len(row) >= 2)
+
+
+def _parse_muxers(output):
+    # "  E mp4   MP4 (MPEG-4 Part 14)"; деякі рядки містять кілька назв через кому
+    names = set()
+    for row in _table_rows(output, "--"):
+        if len(row) >= 2 and 'E' in row[0]:
+            names.update(row[1].split(','))
+    return sorted(names)
+
+
+def _parse_encoder_pix_fmts(output):
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("Supported pixel formats:"):
+            return line.split(":", 1)[1].split()
+    # Енкодер не повідомляє обмежень - вважаємо, що підходить будь-який формат
+    return None
+
+
+def _load_disk_cache():
+    try:
+        with open(CACHE_FILE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_disk_cache(cache):
+    try:
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        temp_path = f"{CACHE_FILE_PATH}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temp_path, CACHE_FILE_PATH)
+    except OSError as e:
+        log_node_warning(CAPABILITIES_LOG_PREFIX, f"Could not write capability cache: {e}")
+
+
+def get_capabilities(ffmpeg_path):
+    """
+    Повертає можливості бінарника FFmpeg: {"encoders", "codecs", "pix_fmts", "muxers", "encoder_pix_fmts"}.
+    Результат кешується на диску за шляхом, mtime та розміром, тож повторні запуски не викликають FFmpeg.
+    Повертає None, якщо FFmpeg недоступний.
+    """
+    key = _binary_key(ffmpeg_path)
+    if key is None:
+        return None
+    with _LOCK:
+        if key in _MEMORY_CACHE:
+            return _MEMORY_CACHE[key]
+        disk_cache = _load_disk_cache()
+        capabilities = disk_cache.get(key)
+        # Записи без "codecs" зроблені старішою версією вузла - аналізуємо бінарник наново
+        if capabilities is None or "codecs" not in capabilities:
+            try:
+                encoders_output = _run_ffmpeg(ffmpeg_path, '-encoders')
+                capabilities = {
+                    "encoders": _parse_encoders(encoders_output),
+                    "codecs": _parse_encoder_codecs(encoders_output),
+                    "pix_fmts": _parse_pix_fmts(_run_ffmpeg(ffmpeg_path, '-pix_fmts')),
+                    "muxers": _parse_muxers(_run_ffmpeg(ffmpeg_path, '-muxers')),
+                    "encoder_pix_fmts": {},
+                }
+            except Exception as e:
+                log_node_warning(CAPABILITIES_LOG_PREFIX, f"Capability probe failed for '{ffmpeg_path}': {e}")
+                return None
+            log_node_debug(CAPABILITIES_LOG_PREFIX, f"Probed {len(capabilities['encoders'])} encoders, {len(capabilities['muxers'])} muxers for {key}.")
+            # Записи для інших версій бінарника залишаються - корисно при перемиканні між ними
+            disk_cache[key] = capabilities
+            _save_disk_cache(disk_cache)
+        _MEMORY_CACHE[key] = capabilities
+        return capabilities
+
+
+def _encoder_pix_fmts(ffmpeg_path, capabilities, encoder):
+    """Підтримувані енкодером формати пікселів (ліниво, з кешем у тому ж файлі)."""
+    with _LOCK:
+        pix_fmts_by_encoder = capabilities.setdefault("encoder_pix_fmts", {})
+        if encoder in pix_fmts_by_encoder:
+            return pix_fmts_by_encoder[encoder]
+    try:
+        supported = _parse_encoder_pix_fmts(_run_ffmpeg(ffmpeg_path, '-h', f'encoder={encoder}'))
+    except Exception:
+        return None
+    key = _binary_key(ffmpeg_path)
+    # Спільний словник можливостей змінюється і зберігається лише під блокуванням
+    with _LOCK:
+        pix_fmts_by_encoder[encoder] = supported
+        disk_cache = _load_disk_cache()
+        disk_cache[key] = capabilities
+        _save_disk_cache(disk_cache)
+    return supported
+
+
+def validate_encode_params(ffmpeg_path, codec=None, pixel_format=None, output_format=None,
+                           audio_codec=None, output_file_opt="", log_prefix=CAPABILITIES_LOG_PREFIX):
+    """
+    Перевіряє параметри вузла за кешем можливостей ще до обробки кадрів.
+    Повертає список повідомлень про помилки (порожній - все гаразд або перевірка неможлива).
+    Несумісна пара енкодер/формат пікселів лише логується як попередження.
+    Значення, перевизначені в output_file_opt (-c:v/-vcodec, -c:a, -pix_fmt, -f), не перевіряються.
+    """
+    capabilities = get_capabilities(ffmpeg_path)
+    if capabilities is None:
+        return []
+    overridden = option_flags(output_file_opt)
+    if '-c:v' in overridden: codec = None
+    if '-c:a' in overridden: audio_codec = None
+    if '-pix_fmt' in overridden: pixel_format = None
+    if '-f' in overridden: output_format = None
+
+    errors = []
+    encoders = capabilities["encoders"]
+    # Як і FFmpeg, приймаємо і назву енкодера (libmp3lame), і назву кодека (mp3, h264)
+    available = set(encoders) | set(capabilities.get("codecs", {}))
+    if codec and codec != 'copy' and codec not in available:
+        errors.append(f"Video encoder '{codec}' is not available in this ffmpeg build.")
+    if audio_codec and audio_codec != 'copy' and audio_codec not in available:
+        errors.append(f"Audio encoder '{audio_codec}' is not available in this ffmpeg build.")
+    if pixel_format and pixel_format != 'copy':
+        if pixel_format not in capabilities["pix_fmts"]:
+            errors.append(f"Pixel format '{pixel_format}' is not known to this ffmpeg build.")
+        elif codec and codec != 'copy' and codec in encoders:
+            supported = _encoder_pix_fmts(ffmpeg_path, capabilities, codec)
+            if supported is not None and pixel_format not in supported:
+                # FFmpeg у цьому випадку сам обирає найближчий формат, тому це лише попередження
+                log_node_warning(log_prefix, f"Encoder '{codec}' does not support pixel format '{pixel_format}'; "
+                                             f"ffmpeg will pick the closest one. Supported: {', '.join(supported)}.")
+    muxer = FORMAT_TO_MUXER.get(output_format, output_format)
+    if muxer and muxer not in capabilities["muxers"]:
+        errors.append(f"Output format '{output_format}' (muxer '{muxer}') is not available in this ffmpeg build.")
+    return errors
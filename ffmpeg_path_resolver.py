@@ -1,15 +1,23 @@
 # ffmpeg_path_resolver.py
 import os
+import json
+import shutil
 import subprocess
-import configparser
+import threading
+from .node_config import get_config_str
 from .node_logger import log_node_info, log_node_success, log_node_warning, log_node_error, log_node_debug
 
 _CACHED_FFMPEG_PATH = None
 _CACHED_FFMPEG_SOURCE_TYPE = None # Тип джерела: "config", "local_bin", "system_path", "fallback"
+_RESOLVE_LOCK = threading.Lock()
 
 # Використовуємо фіксований префікс для логів цього модуля
 RESOLVER_LOG_PREFIX = "FFmpegPathResolver" 
 
+PACKAGE_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
+# Знайдений шлях і відбиток бінарника (шлях, mtime, розмір) - перезапуски не запускають ffmpeg повторно
+STAMP_FILE_PATH = os.path.join(PACKAGE_DIRECTORY, ".cache", "ffmpeg_path.json")
+
 def _test_ffmpeg_executable(path_to_test):
     if not path_to_test: return False
     try:
@@ -19,26 +27,78 @@ def _test_ffmpeg_executable(path_to_test):
     except Exception:
         return False
 
-def initialize_ffmpeg_path_and_log(package_root_directory):
+def _binary_fingerprint(path):
+    """Відбиток виконуваного файлу: [абсолютний шлях, mtime_ns, розмір] або None."""
+    resolved = shutil.which(path) or path
+    try:
+        stat = os.stat(resolved)
+    except OSError:
+        return None
+    return [os.path.realpath(resolved), stat.st_mtime_ns, stat.st_size]
+
+
+def _stamp_inputs(package_root_directory):
+    """Все, від чого залежить вибір шляху: значення з конфігу, наявність локального бінарника, PATH."""
+    return {
+        "custom_ffmpeg_path": get_config_str("FFMPEG", "custom_ffmpeg_path"),
+        "local_bin": os.path.exists(os.path.join(package_root_directory, "ffmpeg_bin", "ffmpeg")),
+        "env_path": os.environ.get("PATH", ""),
+    }
+
+
+def _load_stamp(package_root_directory):
+    """Повертає (шлях, тип джерела) з попереднього запуску, якщо нічого не змінилось."""
+    try:
+        with open(STAMP_FILE_PATH, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stamp.get("inputs") != _stamp_inputs(package_root_directory):
+        return None
+    if stamp.get("fingerprint") is None or stamp["fingerprint"] != _binary_fingerprint(stamp.get("path", "")):
+        return None
+    return stamp["path"], stamp.get("source_type", "unknown")
+
+
+def _save_stamp(package_root_directory, path, source_type):
+    stamp = {"path": path, "source_type": source_type, "fingerprint": _binary_fingerprint(path),
+             "inputs": _stamp_inputs(package_root_directory)}
+    try:
+        os.makedirs(os.path.dirname(STAMP_FILE_PATH), exist_ok=True)
+        temp_path = f"{STAMP_FILE_PATH}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f)
+        os.replace(temp_path, STAMP_FILE_PATH)
+    except OSError as e:
+        log_node_debug(RESOLVER_LOG_PREFIX, f"Could not write ffmpeg path stamp: {e}")
+
+
+def initialize_ffmpeg_path_and_log(package_root_directory=PACKAGE_DIRECTORY):
     global _CACHED_FFMPEG_PATH, _CACHED_FFMPEG_SOURCE_TYPE
-    if _CACHED_FFMPEG_PATH is not None: # Вже ініціалізовано
-        return
+    with _RESOLVE_LOCK:
+        if _CACHED_FFMPEG_PATH is not None: # Вже ініціалізовано
+            return
+
+        stamped = _load_stamp(package_root_directory)
+        if stamped:
+            _CACHED_FFMPEG_PATH, _CACHED_FFMPEG_SOURCE_TYPE = stamped
+            log_node_info(RESOLVER_LOG_PREFIX, f"Using ffmpeg ({_CACHED_FFMPEG_SOURCE_TYPE}, validated earlier): {_CACHED_FFMPEG_PATH}")
+            return
 
+        determined_path, source_type = _resolve_ffmpeg_path(package_root_directory)
+        if source_type != "fallback":
+            _save_stamp(package_root_directory, determined_path, source_type)
+        _CACHED_FFMPEG_PATH = determined_path
+        _CACHED_FFMPEG_SOURCE_TYPE = source_type
+
+
+def _resolve_ffmpeg_path(package_root_directory):
     ffmpeg_command_name = "ffmpeg"
     determined_path = None
     source_type = "unknown"
 
     # 1. Config file
-    config_file_path = os.path.join(package_root_directory, "ffmpeg_config.ini")
-    path_from_config_ini = None
-    if os.path.exists(config_file_path):
-        try:
-            config = configparser.ConfigParser(); config.read(config_file_path)
-            if 'FFMPEG' in config and 'custom_ffmpeg_path' in config['FFMPEG']:
-                configured_value = config['FFMPEG']['custom_ffmpeg_path'].strip()
-                if configured_value: path_from_config_ini = configured_value
-        except Exception as e_cfg:
-            log_node_warning(RESOLVER_LOG_PREFIX, f"Error reading ffmpeg_config.ini: {e_cfg}.")
+    path_from_config_ini = get_config_str("FFMPEG", "custom_ffmpeg_path") or None
 
     if path_from_config_ini:
         abs_path = os.path.abspath(os.path.join(package_root_directory, path_from_config_ini) if not os.path.isabs(path_from_config_ini) else path_from_config_ini)
@@ -76,15 +136,17 @@ def initialize_ffmpeg_path_and_log(package_root_directory):
             determined_path = ffmpeg_command_name # Fallback
             source_type = "fallback"
 
-    _CACHED_FFMPEG_PATH = determined_path
-    _CACHED_FFMPEG_SOURCE_TYPE = source_type
+    return determined_path, source_type
+
+
+def start_background_resolution(package_root_directory=PACKAGE_DIRECTORY):
+    """Знаходить ffmpeg у фоновому потоці, не блокуючи імпорт пакету."""
+    threading.Thread(target=initialize_ffmpeg_path_and_log, args=(package_root_directory,),
+                     name="san4itos_ffmpeg_resolve", daemon=True).start()
 
 
 def get_ffmpeg_path():
-    global _CACHED_FFMPEG_PATH
     if _CACHED_FFMPEG_PATH is None:
-        # Ця ситуація не повинна виникати, якщо initialize_ffmpeg_path_and_log викликано з __init__.py пакету
-        log_node_error("FFmpegPath", "FATAL: get_ffmpeg_path() called before path was initialized!")
-        # Повертаємо дефолт, але це ознака проблеми в порядку ініціалізації
-        return "ffmpeg" 
+        # Перше використання до завершення фонового пошуку - чекаємо на нього (або шукаємо самі)
+        initialize_ffmpeg_path_and_log()
     return _CACHED_FFMPEG_PATH
\ No newline at end of file
@@ -0,0 +1,85 @@
+# frame_converter.py
+import threading
+# torch імпортується всередині методів, щоб не сповільнювати завантаження пакету
+
+# Орієнтовний розмір float32 шматка, що конвертується за один прохід (байти)
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def default_chunk_size(images, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Кількість кадрів у шматку так, щоб проміжний float32 буфер не перевищував chunk_bytes."""
+    frame_bytes = max(1, images[0].numel() * 4)
+    return max(1, min(len(images), chunk_bytes // frame_bytes))
+
+
+class FrameBatchConverter:
+    """
+    Векторизована конвертація батчу IMAGE (float 0..1, [B,H,W,C]) у uint8 (bit_depth=8)
+    або little-endian uint16 (bit_depth=16, для rgb48le/rgba64le). Кожен шматок проходить clamp/scale/round/cast за одну операцію і записується
+    у заздалегідь виділений буфер, який повторно використовується між шматками.
+    Для CUDA тензорів буфер закріплений (pinned), щоб копіювання з GPU було швидшим.
+    float32 робочий буфер один на потік, що конвертує, а не на кожен вихідний буфер.
+    """
+
+    def __init__(self, images, chunk_size=None, bit_depth=8):
+        self.images = images
+        self.bit_depth = 16 if bit_depth > 8 else 8
+        self.chunk_size = max(1, min(chunk_size or default_chunk_size(images), len(images)))
+        self.frame_shape = tuple(images.shape[1:])
+        self._on_gpu = images.device.type == 'cuda'
+        self._local = threading.local()
+
+    def __len__(self):
+        return (len(self.images) + self.chunk_size - 1) // self.chunk_size
+
+    def allocate_buffer(self):
+        """Виділяє вихідний буфер на один шматок (uint8 тензор або numpy '<u2' для 16 біт)."""
+        import torch
+        shape = (self.chunk_size,) + self.frame_shape
+        if self.bit_depth == 16:
+            # У torch немає повноцінного uint16, тож вихідний буфер - numpy масив '<u2'
+            import numpy as np
+            return np.empty(shape, dtype='<u2')
+        pin = self._on_gpu and torch.cuda.is_available()
+        return torch.empty(shape, dtype=torch.uint8, pin_memory=pin)
+
+    def _scratch(self):
+        """float32 робочий буфер поточного потоку (на GPU обчислення йдуть на пристрої, буфер не потрібен)."""
+        if self._on_gpu:
+            return None
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            import torch
+            scratch = self._local.scratch = torch.empty((self.chunk_size,) + self.frame_shape, dtype=torch.float32)
+        return scratch
+
+    def convert_chunk(self, index, out):
+        """
+        Конвертує шматок з номером index у наданий вихідний буфер.
+        Повертає numpy view на uint8/uint16 дані (дійсний, доки буфер не буде перезаписано).
+        """
+        import torch
+        scratch = self._scratch()
+        start = index * self.chunk_size
+        batch = self.images[start:start + self.chunk_size]
+        count = len(batch)
+        out = out[:count]
+        if self.bit_depth == 16:
+            import numpy as np
+            if self._on_gpu:
+                work = batch.clamp(0.0, 1.0).mul_(65535.0).round_().cpu()
+            else:
+                work = scratch[:count]
+                torch.clamp(batch, 0.0, 1.0, out=work)
+                work.mul_(65535.0).round_()
+            np.copyto(out, work.numpy(), casting='unsafe')
+            return out
+        if self._on_gpu:
+            # Один прохід на GPU, потім передача вже стиснутих до uint8 даних
+            out.copy_(batch.clamp(0.0, 1.0).mul_(255.0).round_().to(torch.uint8))
+        else:
+            work = scratch[:count]
+            torch.clamp(batch, 0.0, 1.0, out=work)
+            work.mul_(255.0).round_()
+            out.copy_(work)
+        return out.numpy()
@@ -0,0 +1,239 @@
+# instrumentation.py
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from .node_config import get_config_int, get_config_str
+from .node_logger import log_node_debug, log_node_warning
+
+METRICS_LOG_PREFIX = "Metrics"
+
+_thread_state = threading.local()
+
+
+def current_run():
+    """Повертає метрики запуску, що виконується у поточному потоці (або None)."""
+    return getattr(_thread_state, "run", None)
+
+
+class RunMetrics:
+    """
+    Метрики одного запуску вузла: час етапів (секунди) та довільні значення
+    (кількість кадрів, розмір файлу, швидкість FFmpeg). Етапи, що виконуються
+    паралельно в кількох потоках (наприклад, конвертація), підсумовуються.
+    """
+
+    def __init__(self, node, **values):
+        self.node = node
+        self.started_at = time.time()
+        self.status = "running"
+        self.stages = {}
+        self.values = dict(values)
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def set(self, key, value):
+        with self._lock:
+            self.values[key] = value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "node": self.node,
+                "status": self.status,
+                "started_at": self.started_at,
+                "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                **self.values,
+            }
+
+
+class RingBufferSink:
+    """Зберігає останні N записів у пам'яті."""
+
+    def __init__(self, size=100):
+        self._records = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+
+class JsonLinesSink:
+    """Дописує кожен запис окремим JSON рядком у файл."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+class PrometheusTextSink:
+    """
+    Агрегує лічильники у форматі Prometheus text exposition. Якщо задано path,
+    після кожного запису файл атомарно перезаписується (для node_exporter textfile collector).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._runs = {}
+        self._stage_seconds = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        node = record.get("node", "unknown")
+        with self._lock:
+            key = (node, record.get("status", "unknown"))
+            self._runs[key] = self._runs.get(key, 0) + 1
+            for stage, seconds in record.get("stages", {}).items():
+                self._stage_seconds[(node, stage)] = self._stage_seconds.get((node, stage), 0.0) + seconds
+            for name in ("frames", "output_bytes"):
+                if isinstance(record.get(name), (int, float)):
+                    self._totals[(node, name)] = self._totals.get((node, name), 0) + record[name]
+            text = self._render_locked()
+        if self.path:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+
+    def render(self):
+        with self._lock:
+            return self._render_locked()
+
+    def _render_locked(self):
+        lines = ["# TYPE san4itos_runs_total counter"]
+        lines += [f'san4itos_runs_total{{node="{node}",status="{status}"}} {count}' for (node, status), count in sorted(self._runs.items())]
+        lines.append("# TYPE san4itos_stage_seconds_total counter")
+        lines += [f'san4itos_stage_seconds_total{{node="{node}",stage="{stage}"}} {seconds:.6f}' for (node, stage), seconds in sorted(self._stage_seconds.items())]
+        for name in ("frames", "output_bytes"):
+            lines.append(f"# TYPE san4itos_{name}_total counter")
+            lines += [f'san4itos_{name}_total{{node="{node}"}} {value}' for (node, metric), value in sorted(self._totals.items()) if metric == name]
+        return "\n".join(lines) + "\n"
+
+
+_SINKS = None
+_SINKS_LOCK = threading.Lock()
+
+
+def _configured_sinks():
+    sinks = []
+    names = [name.strip().lower() for name in get_config_str("INSTRUMENTATION", "sinks", "memory").split(",") if name.strip()]
+    for name in names:
+        if name == "memory":
+            sinks.append(RingBufferSink(get_config_int("INSTRUMENTATION", "memory_size", 100)))
+        elif name == "jsonl":
+            path = get_config_str("INSTRUMENTATION", "jsonl_path")
+            if path: sinks.append(JsonLinesSink(path))
+            else: log_node_warning(METRICS_LOG_PREFIX, "Sink 'jsonl' requires [INSTRUMENTATION] jsonl_path. Skipping.")
+        elif name == "prometheus":
+            sinks.append(PrometheusTextSink(get_config_str("INSTRUMENTATION", "prometheus_path") or None))
+        else:
+            log_node_warning(METRICS_LOG_PREFIX, f"Unknown metrics sink '{name}'. Skipping.")
+    return sinks
+
+
+def get_sinks():
+    global _SINKS
+    with _SINKS_LOCK:
+        if _SINKS is None:
+            _SINKS = _configured_sinks()
+        return list(_SINKS)
+
+
+def add_sink(sink):
+    """Додає власний приймач метрик (будь-який об'єкт з методом emit(record))."""
+    get_sinks()
+    with _SINKS_LOCK:
+        _SINKS.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _SINKS_LOCK:
+        if _SINKS and sink in _SINKS:
+            _SINKS.remove(sink)
+
+
+@contextmanager
+def instrumented_run(node, **values):
+    """
+    Відкриває запуск для поточного потоку. Після виходу запис передається всім приймачам.
+    Статус встановлює код вузла (run.status); за замовчуванням - "done", при винятку - "failed".
+    """
+    run = RunMetrics(node, **values)
+    previous = current_run()
+    _thread_state.run = run
+    start = time.perf_counter()
+    try:
+        yield run
+    except Exception:
+        run.status = "failed"
+        raise
+    finally:
+        _thread_state.run = previous
+        if run.status == "running":
+            run.status = "done"
+        run.set("total_seconds", round(time.perf_counter() - start, 6))
+        record = run.to_dict()
+        log_node_debug(METRICS_LOG_PREFIX, f"{node}: {record['status']} in {record['total_seconds']:.2f}s, stages {record['stages']}")
+        for sink in get_sinks():
+            try:
+                sink.emit(record)
+            except Exception as e:
+                log_node_warning(METRICS_LOG_PREFIX, f"Metrics sink {type(sink).__name__} failed: {e}")
+
+
+@contextmanager
+def attached_run(run):
+    """Прив'язує вже відкритий запуск до поточного (робочого) потоку."""
+    previous = current_run()
+    _thread_state.run = run
+    try:
+        yield run
+    finally:
+        _thread_state.run = previous
+
+
+def register_routes():
+    """Реєструє HTTP маршрути метрик у сервері ComfyUI (якщо він доступний)."""
+    try:
+        from aiohttp import web
+        from server import PromptServer
+        routes = PromptServer.instance.routes
+    except Exception:
+        return False
+
+    @routes.get("/san4itos/metrics")
+    async def prometheus_metrics(request):
+        text = "".join(sink.render() for sink in get_sinks() if isinstance(sink, PrometheusTextSink))
+        return web.Response(text=text, content_type="text/plain")
+
+    @routes.get("/san4itos/metrics/recent")
+    async def recent_metrics(request):
+        records = [record for sink in get_sinks() if isinstance(sink, RingBufferSink) for record in sink.records()]
+        return web.json_response(records)
+
+    return True
@@ -0,0 +1,250 @@
+# media_probe.py
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from .node_logger import log_node_debug, log_node_warning
+
+PROBE_LOG_PREFIX = "MediaProbe"
+CACHE_FILE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".cache", "media_probe.json")
+# Скільки файлів пам'ятати (у пам'яті та на диску); найстаріші записи витісняються
+MAX_CACHE_ENTRIES = 1000
+# Змінюється разом з форматом запису, щоб старі записи кешу аналізувалися наново
+CACHE_VERSION = 2
+
+# Назви енкодерів вузлів -> назви кодеків у виводі ffprobe
+ENCODER_TO_CODEC = {"libx264": "h264", "libx265": "hevc", "libvpx-vp9": "vp9", "libsvtav1": "av1", "libaom-av1": "av1",
+                    "libopus": "opus", "libmp3lame": "mp3", "libvorbis": "vorbis"}
+
+# Кодеки, які можна скопіювати у контейнер без перекодування (None - будь-які)
+CONTAINER_CODECS = {
+    "mp4": ({"h264", "hevc", "av1", "vp9", "mpeg4"}, {"aac", "mp3", "opus", "ac3", "eac3", "alac", "flac"}),
+    "mov": ({"h264", "hevc", "prores", "mjpeg", "mpeg4"}, {"aac", "mp3", "alac", "ac3", "pcm_s16le", "pcm_s24le"}),
+    "webm": ({"vp8", "vp9", "av1"}, {"opus", "vorbis"}),
+    "mkv": (None, None),
+    "avi": ({"h264", "mpeg4", "mjpeg"}, {"mp3", "ac3", "pcm_s16le"}),
+}
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+# Кількість каналів для назв розкладок, які FFmpeg друкує замість числа
+_CHANNEL_LAYOUTS = {"mono": 1, "stereo": 2, "2.1": 3, "quad": 4, "4.0": 4, "5.0": 5, "5.1": 6, "6.1": 7, "7.1": 8}
+
+
+def get_ffprobe_path(ffmpeg_path):
+    """
+    ffprobe з тієї ж папки, що й ffmpeg (ffmpeg -> ffprobe, ffmpeg.exe -> ffprobe.exe),
+    інакше з системного PATH. None, якщо ffprobe не знайдено.
+    """
+    directory, name = os.path.split(ffmpeg_path)
+    probe_name = re.sub("ffmpeg", "ffprobe", name, count=1, flags=re.IGNORECASE) if "ffmpeg" in name.lower() else "ffprobe"
+    if directory:
+        candidate = os.path.join(directory, probe_name)
+        if os.path.isfile(candidate):
+            return candidate
+    return shutil.which(probe_name) or shutil.which("ffprobe")
+
+
+def _parse_rate(value):
+    # "30000/1001" -> 29.97; "0/0" -> None
+    try:
+        num, _, den = str(value).partition("/")
+        rate = float(num) / float(den or 1)
+        return rate if rate > 0 else None
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _empty_info():
+    return {"format_name": None, "duration": None, "video_codec": None, "pix_fmt": None, "width": 0, "height": 0,
+            "rotation": 0, "fps": None, "frame_count": None, "audio_codec": None, "audio_channels": 0, "sample_rate": 0}
+
+
+def _normalize_rotation(value):
+    # "-90", "90.00", 270 -> 0/90/180/270
+    try:
+        return int(round(float(value))) % 360
+    except (TypeError, ValueError):
+        return 0
+
+
+def _apply_rotation(info):
+    """
+    FFmpeg повертає кадри згідно з матрицею відображення (autorotate), тож ширина і висота
+    вихідних кадрів - це розмір після повороту, а не закодований розмір потоку.
+    """
+    if info["rotation"] in (90, 270):
+        info["width"], info["height"] = info["height"], info["width"]
+    return info
+
+
+def _probe_with_ffprobe(ffprobe_path, filepath):
+    result = subprocess.run([ffprobe_path, '-v', 'error', '-show_streams', '-show_format', '-of', 'json', filepath],
+                            capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=30)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe exited with code {result.returncode}")
+    data = json.loads(result.stdout or "{}")
+    info = _empty_info()
+    info["format_name"] = data.get("format", {}).get("format_name")
+    info["duration"] = _parse_rate(data.get("format", {}).get("duration"))
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and info["video_codec"] is None:
+            # Обкладинки (attached_pic) не є відеопотоком
+            if stream.get("disposition", {}).get("attached_pic"): continue
+            info["video_codec"] = stream.get("codec_name")
+            info["pix_fmt"] = stream.get("pix_fmt")
+            info["width"], info["height"] = int(stream.get("width", 0)), int(stream.get("height", 0))
+            # Нові версії - side_data "Display Matrix", старі - тег rotate
+            rotations = [data["rotation"] for data in stream.get("side_data_list", []) if "rotation" in data]
+            info["rotation"] = _normalize_rotation(rotations[0] if rotations else stream.get("tags", {}).get("rotate", 0))
+            info["fps"] = _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate"))
+            if str(stream.get("nb_frames", "")).isdigit():
+                info["frame_count"] = int(stream["nb_frames"])
+        elif stream.get("codec_type") == "audio" and info["audio_codec"] is None:
+            info["audio_codec"] = stream.get("codec_name")
+            info["audio_channels"] = int(stream.get("channels", 0))
+            info["sample_rate"] = int(stream.get("sample_rate", 0))
+    return _apply_rotation(info)
+
+
+def _strip_parentheses(text):
+    previous = None
+    while previous != text:
+        previous, text = text, re.sub(r"\([^()]*\)", "", text)
+    return text
+
+
+def _probe_with_ffmpeg(ffmpeg_path, filepath):
+    """Запасний варіант без ffprobe: розбір заголовка 'ffmpeg -i' (stderr)."""
+    result = subprocess.run([ffmpeg_path, '-hide_banner', '-i', filepath], capture_output=True, text=True,
+                            encoding='utf-8', errors='replace', timeout=30)
+    output = result.stderr
+    info = _empty_info()
+    match = re.search(r"Input #0, (.+?), from", output)
+    if match: info["format_name"] = match.group(1)
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", output)
+    if match: info["duration"] = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+    video_stream_seen = False
+    for line in output.splitlines():
+        if "Stream #" not in line:
+            # Поворот друкується в side data або метаданих після рядка першого відеопотоку
+            rotation = re.search(r"displaymatrix: rotation of (-?\d+(?:\.\d+)?) degrees|^\s*rotate\s*:\s*(-?\d+)", line)
+            if rotation and video_stream_seen and not info["rotation"]:
+                info["rotation"] = _normalize_rotation(rotation.group(1) or rotation.group(2))
+            continue
+        video_stream_seen = info["video_codec"] is None and ": Video: " in line and "attached pic" not in line
+        if ": Video: " in line: kind, description = "video", line.split(": Video: ", 1)[1]
+        elif ": Audio: " in line: kind, description = "audio", line.split(": Audio: ", 1)[1]
+        else: continue
+        parts = [part.strip() for part in _strip_parentheses(description).split(",")]
+        if kind == "video" and info["video_codec"] is None and "attached pic" not in line:
+            info["video_codec"] = parts[0].split()[0]
+            info["pix_fmt"] = parts[1].split()[0] if len(parts) > 1 else None
+            for part in parts:
+                size = re.match(r"(\d+)x(\d+)", part)
+                if size and not info["width"]:
+                    info["width"], info["height"] = int(size.group(1)), int(size.group(2))
+                rate = re.match(r"(\d+(?:\.\d+)?) (fps|tbr)", part)
+                if rate and info["fps"] is None:
+                    info["fps"] = float(rate.group(1))
+        elif kind == "audio" and info["audio_codec"] is None:
+            info["audio_codec"] = parts[0].split()[0]
+            for part in parts[1:]:
+                if part.endswith(" Hz"): info["sample_rate"] = int(part.split()[0])
+                elif part in _CHANNEL_LAYOUTS: info["audio_channels"] = _CHANNEL_LAYOUTS[part]
+                elif part.endswith(" channels"): info["audio_channels"] = int(part.split()[0])
+            if not info["audio_channels"]: info["audio_channels"] = 2
+    if info["video_codec"] is None and info["audio_codec"] is None:
+        raise RuntimeError(output.strip().splitlines()[-1] if output.strip() else "ffmpeg could not read the file")
+    return _apply_rotation(info)
+
+
+def _file_key(filepath):
+    stat = os.stat(filepath)
+    return f"v{CACHE_VERSION}|{os.path.realpath(filepath)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def _get_cache():
+    global _CACHE
+    if _CACHE is None:
+        try:
+            with open(CACHE_FILE_PATH, 'r', encoding='utf-8') as f:
+                _CACHE = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            _CACHE = OrderedDict()
+    return _CACHE
+
+
+def _save_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE_PATH), exist_ok=True)
+        temp_path = f"{CACHE_FILE_PATH}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(cache.items()), f)
+        os.replace(temp_path, CACHE_FILE_PATH)
+    except OSError as e:
+        log_node_debug(PROBE_LOG_PREFIX, f"Could not write probe cache: {e}")
+
+
+def probe_media(ffmpeg_path, filepath):
+    """
+    Повертає словник з параметрами файлу: контейнер, тривалість, кодек/формат пікселів/розмір/fps
+    відео, кількість кадрів (з контейнера або оцінена з тривалості) та параметри першої аудіодоріжки.
+    Результат кешується за шляхом, mtime та розміром файлу, тож незмінений файл аналізується один раз.
+    """
+    key = _file_key(filepath)
+    with _CACHE_LOCK:
+        cache = _get_cache()
+        if key in cache:
+            cache.move_to_end(key)
+            return dict(cache[key])
+    info = _probe_uncached(ffmpeg_path, filepath)
+    with _CACHE_LOCK:
+        cache = _get_cache()
+        cache[key] = info
+        while len(cache) > MAX_CACHE_ENTRIES:
+            cache.popitem(last=False)
+        _save_cache(cache)
+    return dict(info)
+
+
+def _probe_uncached(ffmpeg_path, filepath):
+    """Використовує ffprobe, а якщо його немає - розбирає вивід 'ffmpeg -i'."""
+    ffprobe_path = get_ffprobe_path(ffmpeg_path)
+    try:
+        if ffprobe_path:
+            info = _probe_with_ffprobe(ffprobe_path, filepath)
+        else:
+            log_node_debug(PROBE_LOG_PREFIX, "ffprobe not found next to ffmpeg or in PATH. Parsing 'ffmpeg -i' output.")
+            info = _probe_with_ffmpeg(ffmpeg_path, filepath)
+    except Exception as e:
+        log_node_warning(PROBE_LOG_PREFIX, f"Could not probe '{filepath}': {e}")
+        raise
+    if info["frame_count"] is None and info["duration"] and info["fps"]:
+        info["frame_count"] = int(round(info["duration"] * info["fps"]))
+    return info
+
+
+def container_accepts(output_format, video_codec=None, audio_codec=None):
+    """Чи можна скопіювати потоки з такими кодеками у контейнер output_format без перекодування."""
+    video_codecs, audio_codecs = CONTAINER_CODECS.get(output_format, (set(), set()))
+    if video_codec and video_codecs is not None and video_codec not in video_codecs: return False
+    if audio_codec and audio_codecs is not None and audio_codec not in audio_codecs: return False
+    return True
+
+
+def stream_copy_reason(info, codec, pixel_format, output_format):
+    """
+    Пояснення, чому відеопотік можна скопіювати замість перекодування (збігаються кодек
+    і формат пікселів, контейнер приймає кодек), або None, якщо копіювати не можна.
+    """
+    source_codec = info.get("video_codec")
+    if not source_codec: return None
+    if codec != 'copy' and ENCODER_TO_CODEC.get(codec, codec) != source_codec: return None
+    if pixel_format != 'copy' and pixel_format != info.get("pix_fmt"): return None
+    if not container_accepts(output_format, video_codec=source_codec): return None
+    return f"source is already {source_codec}/{info.get('pix_fmt')}"
@@ -0,0 +1,52 @@
+# node_config.py
+import os
+import configparser
+from .node_logger import log_node_warning
+
+CONFIG_LOG_PREFIX = "NodeConfig"
+CONFIG_FILE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "ffmpeg_config.ini")
+
+_CACHED_CONFIG = None
+
+
+def _get_config():
+    global _CACHED_CONFIG
+    if _CACHED_CONFIG is None:
+        config = configparser.ConfigParser()
+        if os.path.exists(CONFIG_FILE_PATH):
+            try:
+                config.read(CONFIG_FILE_PATH)
+            except Exception as e_cfg:
+                log_node_warning(CONFIG_LOG_PREFIX, f"Error reading ffmpeg_config.ini: {e_cfg}. Using defaults.")
+        _CACHED_CONFIG = config
+    return _CACHED_CONFIG
+
+
+def get_config_str(section, key, default=""):
+    value = _get_config().get(section, key, fallback="").strip()
+    return value if value else default
+
+
+def get_config_int(section, key, default):
+    value = get_config_str(section, key)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        log_node_warning(CONFIG_LOG_PREFIX, f"Invalid integer '{value}' for [{section}] {key}. Using default {default}.")
+        return default
+
+
+def get_temp_root():
+    """
+    Директорія для тимчасових файлів з [PERFORMANCE] temp_dir (наприклад, /dev/shm на tmpfs).
+    None - системна тимчасова директорія (також якщо вказаної директорії не існує).
+    """
+    path = get_config_str("PERFORMANCE", "temp_dir")
+    if not path:
+        return None
+    if not os.path.isdir(path):
+        log_node_warning(CONFIG_LOG_PREFIX, f"[PERFORMANCE] temp_dir '{path}' does not exist. Using the system temp directory.")
+        return None
+    return path
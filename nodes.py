@@ -1,75 +1,536 @@
 # nodes.py
 import subprocess
+import json
 import os
+import re
 import shlex
 import tempfile
-import numpy as np
-from PIL import Image
+import threading
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import folder_paths
-import torch
-import torchaudio
-import json
 from comfy.cli_args import args
 from .ffmpeg_path_resolver import get_ffmpeg_path
+from .frame_converter import FrameBatchConverter, default_chunk_size
+from .node_config import get_config_int, get_temp_root
+from .encode_jobs import get_encode_job_manager, current_job, attached_job, CombinedProgress
+from .instrumentation import instrumented_run, current_run, attached_run
+from .ffmpeg_capabilities import validate_encode_params
+from .media_probe import probe_media, stream_copy_reason, container_accepts, ENCODER_TO_CODEC
+from .encode_session import open_session, get_session, close_session, STATE_FINALIZED
+from .output_cache import get_output_cache, compute_cache_key, hash_metadata
+from .video_decoder import DecodeOptions, ChunkedVideoReader, decode_audio, make_video_components
+from .video_filters import FilterOptions, RESIZE_MODES, SCALE_ALGORITHMS
+from .ffmpeg_args import build_output_args, split_mux_options, option_flags, canonical_flag
+from .batch_convert import expand_input_paths, output_paths_for, plan_workers, params_fingerprint, get_batch_manifest
+from .video_metadata import METADATA_MODES, metadata_tags, write_ffmetadata_file, write_sidecars
 from .node_logger import log_node_info, log_node_success, log_node_error, log_node_warning, log_node_debug 
 
+_dry_run_state = threading.local()
+
+
+@contextmanager
+def _dry_run_capture(commands):
+    """
+    Поки активний (commands не None), команди FFmpeg у цьому потоці не виконуються,
+    а додаються у список commands - так вузол може показати фінальні команди (dry run).
+    """
+    previous = getattr(_dry_run_state, "commands", None)
+    _dry_run_state.commands = commands
+    try:
+        yield commands
+    finally:
+        _dry_run_state.commands = previous
+
+
+def _dry_run_result(commands, log_prefix):
+    text = [shlex.join(cmd) for cmd in commands]
+    for line in text: log_node_info(log_prefix, f"Dry run: {line}")
+    return {"ui": {"text": text}}
+
+
+class _InputPipe:
+    """Анонімний канал, що передається FFmpeg як додатковий вхід (pipe:N)."""
+
+    def __init__(self, data):
+        self.data = data
+        self.read_fd, self.write_fd = os.pipe()
+
+    @property
+    def url(self):
+        return f"pipe:{self.read_fd}"
+
+    def write_all(self, log_prefix, run=None):
+        start = time.perf_counter()
+        try:
+            with os.fdopen(self.write_fd, 'wb') as f:
+                self.write_fd = None
+                f.write(self.data)
+        except (BrokenPipeError, OSError) as e:
+            log_node_warning(log_prefix, f"ffmpeg closed its audio input early: {e}")
+        finally:
+            if run is not None: run.add_time("audio_write", time.perf_counter() - start)
+
+    def close_read_end(self):
+        if self.read_fd is not None:
+            os.close(self.read_fd)
+            self.read_fd = None
+
+    def close(self):
+        self.close_read_end()
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+
+def _write_pil_frame(image_format, **save_options):
+    def write(frame, path):
+        from PIL import Image
+        Image.fromarray(frame).save(path, image_format, **save_options)
+    return write
+
+
+def _write_netpbm_frame(frame, path):
+    """PPM (RGB) або PAM (RGBA) без PIL: заголовок і сирі байти кадру."""
+    h, w, channels = frame.shape
+    if channels == 4:
+        header = f"P7\nWIDTH {w}\nHEIGHT {h}\nDEPTH 4\nMAXVAL 255\nTUPLTYPE RGB_ALPHA\nENDHDR\n"
+    else:
+        header = f"P6\n{w} {h}\n255\n"
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(memoryview(frame).cast('B'))
+
+
+# Формати проміжних файлів кадрів: назва -> (розширення, функція запису кадру)
+_SEQUENCE_WRITERS = {
+    "png sequence": ("png", _write_pil_frame("PNG")),
+    "png sequence (fast)": ("png", _write_pil_frame("PNG", compress_level=1)),
+    "bmp sequence": ("bmp", _write_pil_frame("BMP")),
+    "ppm sequence": ("ppm", _write_netpbm_frame),
+    "tiff sequence": ("tiff", _write_pil_frame("TIFF")),
+}
+FRAME_TRANSPORTS = ["raw pipe", "raw file"] + list(_SEQUENCE_WRITERS)
+
+
+# Параметри користувача, з якими відео потрібно перекодувати навіть при збігу кодека і формату пікселів
+SMART_COPY_BLOCKING_FLAGS = {'-c:v', '-pix_fmt', '-vf', '-filter:v', '-filter_complex', '-crf', '-qp', '-q:v', '-b:v',
+                             '-maxrate', '-bufsize', '-r', '-s', '-g', '-profile:v', '-level', '-tune', '-x264-params',
+                             '-x265-params', '-svtav1-params'}
+
+
+# Розрядність кадрів, що подаються у FFmpeg: auto - 16 біт, якщо хоч один вихід має більше 8 біт на компонент
+INPUT_BIT_DEPTHS = ["auto", "8-bit", "16-bit"]
+
+
+def is_high_bit_depth(pixel_format):
+    """Чи має формат пікселів більше 8 біт на компонент (yuv420p10le, p010le, rgb48le, gbrpf32le, ...)."""
+    match = re.search(r'(\d+)(?:le|be)$', pixel_format or "")
+    if not match: return False
+    digits = match.group(1)
+    # p010/p210/y210: перша цифра - субдискретизація; rgb565/bgr444 - біти окремих компонент упакованого пікселя
+    depth = int(digits[-2:]) if len(digits) == 3 and pixel_format[0] in "py" else int(digits)
+    return 8 < depth <= 64
+
+
+def raw_input_bit_depth(pixel_formats, input_bit_depth="auto"):
+    """8 або 16 - розрядність сирих кадрів для заданих вихідних форматів пікселів."""
+    if input_bit_depth == "16-bit": return 16
+    if input_bit_depth == "8-bit": return 8
+    return 16 if any(is_high_bit_depth(pixel_format) for pixel_format in pixel_formats) else 8
+
+
+# Необов'язкові входи етапу фільтрів (video_filters.FilterOptions), спільні для вузлів збереження та конвертації
+FILTER_INPUTS = {
+    "crop": ("STRING", {"default": "", "tooltip": "Crop before resizing, FFmpeg syntax w:h[:x:y] (centered when x:y is omitted), e.g. iw-200:ih or 1280:720:0:40. Empty = no crop."}),
+    "resize_width": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 2, "tooltip": "Output width. 0 = keep; if only one of width/height is set, the other follows the aspect ratio."}),
+    "resize_height": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 2, "tooltip": "Output height. 0 = keep; if only one of width/height is set, the other follows the aspect ratio."}),
+    "resize_mode": (RESIZE_MODES, {"default": "stretch", "tooltip": "How to reach the exact size when both width and height are set: stretch, fit inside and pad, or fill and crop the overflow."}),
+    "resize_algorithm": (SCALE_ALGORITHMS, {"default": "bicubic", "tooltip": "Scaling algorithm (FFmpeg swscale flags)."}),
+    "pad_color": ("STRING", {"default": "black", "tooltip": "Padding color for 'fit (pad)', e.g. black, white or 0x202020."}),
+    "output_fps": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 240.0, "step": 0.001, "tooltip": "Convert to this frame rate inside FFmpeg (frames are dropped or duplicated). 0 = keep."}),
+}
+
+
+# Спосіб збереження prompt/workflow (video_metadata.METADATA_MODES), спільний для вузлів, що пишуть відео
+METADATA_MODE_INPUT = (METADATA_MODES, {"default": "embed", "tooltip": "How the prompt/workflow is stored. embed: JSON in the comment tag, readable by ComfyUI. compressed: zlib+base64 comment, much smaller but not loadable by ComfyUI. sidecar: a .json file next to the video. off: no metadata."})
+
+
+def parse_renditions(text):
+    """
+    Розбирає додаткові виходи: по одному на рядок "codec pixel_format crf format [параметри ffmpeg]".
+    Порожні рядки та рядки, що починаються з '#', пропускаються. При помилці - ValueError.
+    """
+    renditions = []
+    for line_number, line in enumerate((text or "").splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith('#'): continue
+        try:
+            parts = shlex.split(line)
+        except ValueError as e:
+            raise ValueError(f"Rendition line {line_number}: {e}")
+        if len(parts) < 4 or not parts[2].isdigit():
+            raise ValueError(f"Rendition line {line_number}: expected 'codec pixel_format crf format [options]', got '{line}'.")
+        renditions.append({"codec": parts[0], "pixel_format": parts[1], "crf": int(parts[2]), "output_format": parts[3],
+                           "output_file_opt": shlex.join(parts[4:])})
+    return renditions
+
+
 class FFmpegConverterBase:
     """Базовий клас, що містить спільну логіку для роботи з FFmpeg."""
     
     def _build_ffmpeg_params(self, base_params, override_str, log_prefix):
         """
         Формує фінальний список параметрів для FFmpeg, об'єднуючи базові 
-        параметри з GUI та параметри, введені користувачем.
-        Параметри користувача мають вищий пріоритет.
+        параметри з GUI та параметри, введені користувачем (див. ffmpeg_args.FFmpegArgs).
+        Параметри користувача мають вищий пріоритет; синоніми (-vcodec / -c:v) і специфікатори
+        потоків враховуються, повторювані (-map, -metadata) та параметри без значення (-nostdin) підтримуються.
+        Виняток - '-vf'/'-filter:v': граф користувача дописується після вбудованих фільтрів.
         """
-        # Використовуємо shlex для безпечного парсингу рядка
-        try:
-            override_args = shlex.split(override_str)
-        except ValueError as e:
-            log_node_error(log_prefix, f"Error parsing override parameters: {e}. Ignoring overrides.")
-            override_args = []
+        return build_output_args(base_params, override_str, log_prefix)
 
-        final_params = base_params.copy()
-        
-        # Ітеруємо по спарсених аргументах. Очікуємо пари: флаг, значення.
-        it = iter(override_args)
-        for flag in it:
-            if flag.startswith('-'):
-                try:
-                    # Наступний елемент - це значення для нашого флага
-                    value = next(it)
-                    if flag in final_params:
-                        log_node_warning(log_prefix, f"Overriding GUI parameter '{flag}' with value '{value}' (was '{final_params[flag]}').")
-                    final_params[flag] = value
-                except StopIteration:
-                    log_node_warning(log_prefix, f"Flag '{flag}' provided without a value. Ignoring.")
-            else:
-                log_node_warning(log_prefix, f"Unexpected token '{flag}' in override parameters. Should be a flag starting with '-'. Ignoring.")
+    def _handle_ffmpeg_result(self, returncode, stdout, stderr, log_prefix):
+        if returncode != 0:
+            err_msg = f"ffmpeg error (code {returncode}):\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
+            log_node_error(log_prefix, err_msg)
+            return {"ui": {"text": [f"ffmpeg error (code {returncode}): Check console for details."]}}
+        log_node_success(log_prefix, "FFmpeg command executed successfully.")
+        if stderr.strip():
+            log_node_warning(log_prefix, f"ffmpeg stderr (warnings):\n{stderr}", msg_color_override="GREY")
+        return None # Успіх
 
-        # Перетворюємо словник у список для subprocess
-        result_list = []
-        for key, val in final_params.items():
-            result_list.extend([key, str(val)])
-            
-        return result_list
+    def _execute_ffmpeg_command(self, ffmpeg_cmd, log_prefix, input_pipes=(), stage="encode"):
+        return self._execute_ffmpeg_with_stdin(ffmpeg_cmd, None, log_prefix, input_pipes, stage)
 
-    def _execute_ffmpeg_command(self, ffmpeg_cmd, log_prefix):
+    def _execute_ffmpeg_with_stdin(self, ffmpeg_cmd, data_chunks, log_prefix, input_pipes=(), stage="encode"):
+        """
+        Запускає FFmpeg і передає йому дані (сирі кадри) через stdin, а також дані
+        додаткових входів (наприклад, аудіо) через їхні канали.
+        Кожен вхід записується окремим потоком-письменником, тож FFmpeg кодує, поки кадри ще готуються,
+        і не блокується, чекаючи на один вхід, поки ми пишемо в інший.
+        Прогрес читається з stdout (-progress pipe:1) і передається у фонову задачу, якщо вона є.
+        Ліміт часу задається encode_timeout у конфігу (0 - без обмеження).
+        Час запуску процесу, запису кадрів та роботи FFmpeg (stage) додається до метрик поточного запуску.
+        """
+        # -progress - глобальний параметр, тому ставимо його одразу після виконуваного файлу
+        ffmpeg_cmd = ffmpeg_cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + ffmpeg_cmd[1:]
+        dry_run_commands = getattr(_dry_run_state, "commands", None)
+        if dry_run_commands is not None:
+            dry_run_commands.append(ffmpeg_cmd)
+            for pipe in input_pipes: pipe.close()
+            if hasattr(data_chunks, 'close'): data_chunks.close()
+            return None
         log_node_info(log_prefix, f"Executing ffmpeg: {' '.join(ffmpeg_cmd)}")
+        job = current_job()
+        run = current_run()
+        timeout = get_config_int("PERFORMANCE", "encode_timeout", 0)
         try:
-            process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
-            stdout, stderr = process.communicate(timeout=300)
-            if process.returncode != 0:
-                err_msg = f"ffmpeg error (code {process.returncode}):\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
-                log_node_error(log_prefix, err_msg)
-                return {"ui": {"text": [f"ffmpeg error (code {process.returncode}): Check console for details."]}}
-            else:
-                log_node_success(log_prefix, "FFmpeg command executed successfully.")
-                if stderr.strip():
-                    log_node_warning(log_prefix, f"ffmpeg stderr (warnings):\n{stderr}", msg_color_override="GREY")
-                return None # Успіх
+            stdin = subprocess.PIPE if data_chunks is not None else subprocess.DEVNULL
+            spawn_start = time.perf_counter()
+            try:
+                process = subprocess.Popen(ffmpeg_cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                           pass_fds=[pipe.read_fd for pipe in input_pipes])
+            finally:
+                # Кінці для читання тепер належать FFmpeg
+                for pipe in input_pipes: pipe.close_read_end()
+            process_start = time.perf_counter()
+            if run is not None: run.add_time("ffmpeg_spawn", process_start - spawn_start)
+            output = {}
+
+            def write_chunks():
+                try:
+                    for chunk in data_chunks:
+                        write_start = time.perf_counter()
+                        process.stdin.write(chunk)
+                        if run is not None: run.add_time("write", time.perf_counter() - write_start)
+                except (BrokenPipeError, OSError) as e:
+                    # FFmpeg завершився раніше (наприклад, через помилку параметрів) - деталі будуть у stderr
+                    log_node_warning(log_prefix, f"ffmpeg closed its input early: {e}")
+                except Exception as e:
+                    output['writer_error'] = e
+                    process.kill()
+                finally:
+                    if hasattr(data_chunks, 'close'): data_chunks.close()
+                    try:
+                        process.stdin.close()
+                    except (BrokenPipeError, OSError):
+                        pass
+
+            def read_progress():
+                # Блоки key=value, кожен закінчується рядком progress=continue|end
+                values, other_lines = {}, []
+                for raw_line in process.stdout:
+                    line = raw_line.decode('utf-8', errors='replace').strip()
+                    key, sep, value = line.partition('=')
+                    if not sep:
+                        if line: other_lines.append(line)
+                        continue
+                    values[key] = value.strip()
+                    if key == 'progress':
+                        output['progress'] = dict(values)
+                        if job is not None: job.update_progress(values)
+                        if run is not None:
+                            run.set("ffmpeg_speed", values.get('speed'))
+                            run.set("ffmpeg_fps", values.get('fps'))
+                output['stdout'] = "\n".join(other_lines)
+
+            threads = [
+                threading.Thread(target=read_progress, daemon=True),
+                threading.Thread(target=lambda: output.__setitem__('stderr', process.stderr.read()), daemon=True),
+            ]
+            if data_chunks is not None:
+                threads.append(threading.Thread(target=write_chunks, daemon=True))
+            for pipe in input_pipes:
+                threads.append(threading.Thread(target=pipe.write_all, args=(log_prefix, run), daemon=True))
+            for thread in threads: thread.start()
+            try:
+                process.wait(timeout=timeout if timeout > 0 else None)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                for thread in threads: thread.join()
+                log_node_error(log_prefix, f"ffmpeg did not finish within encode_timeout ({timeout}s) and was terminated.")
+                return {"ui": {"text": [f"ffmpeg timed out after {timeout}s."]}}
+            for thread in threads: thread.join()
+            if run is not None: run.add_time(stage, time.perf_counter() - process_start)
+
+            if 'writer_error' in output:
+                raise output['writer_error']
+            stderr = output.get('stderr', b'').decode('utf-8', errors='replace')
+            return self._handle_ffmpeg_result(process.returncode, output.get('stdout', ''), stderr, log_prefix)
         except Exception as e:
             log_node_error(log_prefix, f"Python error during ffmpeg execution: {e}")
             return {"ui": {"text": [f"Python error: {e}"]}}
+        finally:
+            for pipe in input_pipes: pipe.close()
+
+    def _submit_async_encode(self, video_full_path, encode_fn, label, total_frames=None, outputs=None):
+        """
+        Передає кодування у фонову чергу. Перед цим створюється порожній файл-заглушка, щоб наступний
+        виклик get_save_image_path не видав той самий лічильник, поки задача ще не записала відео.
+        """
+        open(video_full_path, 'ab').close()
+
+        def run():
+            error = encode_fn()
+            if error and os.path.exists(video_full_path) and os.path.getsize(video_full_path) == 0:
+                os.remove(video_full_path)
+            return error
+
+        job = get_encode_job_manager().submit(label, run, total_frames=total_frames, outputs=outputs)
+        return {"ui": {"text": [f"Encode job {job.job_id} queued: {label}"]}}
+
+    def _check_capabilities(self, codec=None, pixel_format=None, output_format=None, audio_codec=None, output_file_opt=""):
+        """Перевіряє параметри за кешем можливостей FFmpeg. Повертає помилку вузла або None."""
+        errors = validate_encode_params(self.ffmpeg_executable_path, codec, pixel_format, output_format,
+                                        audio_codec, output_file_opt, self.NODE_LOG_PREFIX)
+        if not errors:
+            return None
+        for message in errors: log_node_error(self.NODE_LOG_PREFIX, message)
+        return {"ui": {"text": errors}}
+
+    def _run_instrumented(self, encode_fn, output_paths, frames=None):
+        """Виконує кодування в межах запуску з метриками і записує результат (статус, розмір файлів)."""
+        with instrumented_run(self.NODE_LOG_PREFIX, frames=frames) as run:
+            error = encode_fn()
+            run.status = "failed" if error else "done"
+            run.set("output_bytes", sum(os.path.getsize(p) for p in output_paths if os.path.exists(p)))
+            return error
+
+    def _encode_with_output_cache(self, cache_mode, images, audio, params, embedded_tags, video_full_path, encode_fn):
+        """
+        Перевіряє кеш результатів перед кодуванням. При влучанні відео береться з кешу (жорстке посилання
+        або копія); якщо змінились лише метадані - файл перепаковується з новими метаданими без перекодування.
+        Після успішного кодування результат додається в кеш.
+        """
+        if cache_mode == "off":
+            return encode_fn()
+        run = current_run()
+        start = time.perf_counter()
+        cache = get_output_cache()
+        key = compute_cache_key(images, audio, params, cache_mode)
+        metadata_hash = hash_metadata(embedded_tags)
+        entry = cache.lookup(key)
+        if run is not None:
+            run.add_time("cache_lookup", time.perf_counter() - start)
+            run.set("output_cache", "hit" if entry else "miss")
+
+        if entry is None:
+            error = encode_fn()
+            if not error:
+                cache.store(key, video_full_path, metadata_hash)
+            return error
+
+        if entry["metadata_hash"] == metadata_hash:
+            log_node_success(self.NODE_LOG_PREFIX, f"Output cache hit ({key[:12]}). Reusing the previous encode.")
+            cache.materialize(entry, video_full_path)
+            return None
+        log_node_success(self.NODE_LOG_PREFIX, f"Output cache hit ({key[:12]}) with different metadata. Remuxing without re-encoding.")
+        with tempfile.TemporaryDirectory(dir=get_temp_root()) as temp_dir:
+            metadata_input_args, metadata_output_args = self._metadata_args(embedded_tags, temp_dir, 1)
+            ffmpeg_cmd = [self.ffmpeg_executable_path, '-y', '-i', entry["path"]] + metadata_input_args + ['-map', '0', '-c', 'copy']
+            ffmpeg_cmd.extend(metadata_output_args or ['-map_metadata', '-1'])
+            ffmpeg_cmd.append(video_full_path)
+            return self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX, stage="cache_remux")
+
+    def _metadata_args(self, embedded_tags, temp_dir, input_index):
+        """
+        Метадані передаються файлом FFMETADATA1 (окремий вхід '-f ffmetadata' + '-map_metadata'), а не
+        аргументом '-metadata comment=...', тож розмір workflow не впливає на довжину командного рядка.
+        Повертає (вхідні параметри, параметри виходу); без тегів - два порожні списки.
+        """
+        if not embedded_tags: return [], []
+        path = write_ffmetadata_file(os.path.join(temp_dir, "metadata.ffmeta"), embedded_tags)
+        return ['-f', 'ffmetadata', '-i', path], ['-map_metadata', str(input_index)]
+
+    def _prepare_audio_input(self, audio, temp_dir, log_prefix):
+        """
+        Готує аудіо вхід для FFmpeg. Повертає (параметри входу, список каналів).
+        На POSIX системах аудіо передається як сирий f32le PCM через окремий канал без
+        запису на диск; на Windows (без pass_fds) - через тимчасовий WAV файл.
+        """
+        waveform_tensor = audio["waveform"]
+        if waveform_tensor.shape[0] > 1:
+            log_node_warning(log_prefix, f"Audio batch size is {waveform_tensor.shape[0]}. Using the first audio track.")
+        if os.name == 'nt':
+            import torchaudio
+            temp_audio_file = os.path.join(temp_dir, "temp_audio.wav")
+            start = time.perf_counter()
+            torchaudio.save(temp_audio_file, waveform_tensor[0].cpu(), audio["sample_rate"])
+            run = current_run()
+            if run is not None: run.add_time("audio_write", time.perf_counter() - start)
+            return ['-i', temp_audio_file], []
+
+        import torch
+        # [C, N] -> [N, C]: FFmpeg очікує семпли, перемежовані по каналах.
+        # Для моно (або вже перемежованих даних) це view без копіювання пам'яті тензора.
+        waveform = waveform_tensor[0].detach().to(device='cpu', dtype=torch.float32).t()
+        if not waveform.is_contiguous():
+            waveform = waveform.contiguous()
+        channels = waveform.shape[1]
+        pipe = _InputPipe(memoryview(waveform.numpy()).cast('B'))
+        input_args = ['-f', 'f32le', '-ar', str(audio["sample_rate"]), '-ac', str(channels), '-i', pipe.url]
+        return input_args, [pipe]
+
+    def _iter_pipelined_frames(self, images, bit_depth=8, pipelines=1):
+        """
+        Конвеєр підготовки кадрів: пул потоків конвертує шматки наперед, а споживач
+        отримує їх по черзі. Кількість вихідних буферів обмежена max_buffered_frames і
+        max_buffered_mb (back-pressure); float32 робочий буфер - по одному на потік конвертації.
+        pipelines - кількість одночасних конвеєрів (сегментів), між якими ділиться ліміт.
+        """
+        # Генератор виконується в потоці-письменнику, тому метрики запуску беремо тут
+        return self._pipelined_frames(images, current_run(), bit_depth, pipelines)
+
+    def _pipelined_frames(self, images, run, bit_depth=8, pipelines=1):
+        pipelines = max(1, pipelines)
+        max_buffered = max(1, get_config_int("PERFORMANCE", "max_buffered_frames", 64) // pipelines)
+        max_bytes = max(0, get_config_int("PERFORMANCE", "max_buffered_mb", 512)) * 1024 * 1024 // pipelines
+        workers = get_config_int("PERFORMANCE", "conversion_threads", 0)
+        if workers <= 0: workers = min(4, os.cpu_count() or 1)
+
+        frame_bytes = images[0].numel() * (2 if bit_depth > 8 else 1)
+        if max_bytes:
+            # Щонайменше два буфери мають вміститися в ліміт, інакше конвертація не випереджатиме запис
+            max_buffered = max(1, min(max_buffered, max_bytes // max(1, frame_bytes)))
+        chunk_size = min(default_chunk_size(images), max(1, max_buffered // 2))
+        converter = FrameBatchConverter(images, chunk_size, bit_depth)
+        num_buffers = max(2, max_buffered // converter.chunk_size)
+        free_buffers = queue.Queue()
+        for _ in range(min(num_buffers, len(converter))):
+            free_buffers.put(converter.allocate_buffer())
+
+        pending = queue.Queue()
+        stop = threading.Event()
+
+        def convert(index, buffers):
+            start = time.perf_counter()
+            chunk = converter.convert_chunk(index, buffers)
+            if run is not None: run.add_time("convert", time.perf_counter() - start)
+            return chunk, buffers
+
+        def produce(pool):
+            for index in range(len(converter)):
+                # Чекаємо на вільний буфер - так обмежується кількість кадрів у пам'яті
+                while not stop.is_set():
+                    try:
+                        buffers = free_buffers.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        continue
+                if stop.is_set(): break
+                pending.put(pool.submit(convert, index, buffers))
+            pending.put(None)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            producer = threading.Thread(target=produce, args=(pool,), daemon=True)
+            producer.start()
+            try:
+                while True:
+                    future = pending.get()
+                    if future is None: break
+                    chunk, buffers = future.result()
+                    yield chunk
+                    free_buffers.put(buffers)
+            finally:
+                stop.set()
+                producer.join()
+                # Дочікуємося незавершених задач, щоб не закрити пул під час конвертації
+                while not pending.empty():
+                    future = pending.get()
+                    if future is not None: future.cancel()
+
+    def _raw_video_input_args(self, images, fps, bit_depth=8):
+        """Вхідні параметри FFmpeg для сирих RGB кадрів (8 або 16 біт на компонент), що подаються через stdin."""
+        h, w, channels = images.shape[1], images.shape[2], images.shape[3]
+        if bit_depth > 8: input_pix_fmt = 'rgba64le' if channels == 4 else 'rgb48le'
+        else: input_pix_fmt = 'rgba' if channels == 4 else 'rgb24'
+        return ['-f', 'rawvideo', '-pix_fmt', input_pix_fmt, '-s', f'{w}x{h}', '-framerate', str(fps), '-i', '-']
+
+    def _iter_raw_frames(self, images, bit_depth=8, pipelines=1):
+        """Генерує дані кадрів (uint8 або uint16) шматками для передачі у stdin FFmpeg."""
+        return self._iter_pipelined_frames(images, bit_depth, pipelines)
+
+    def _write_intermediate_frames(self, images, temp_dir, frame_transport, fps, bit_depth=8):
+        """
+        Записує кадри у тимчасову директорію у вибраному проміжному форматі та повертає вхідні параметри FFmpeg.
+        bit_depth враховується лише для "raw file"; послідовності зображень завжди 8-бітні.
+        Файли кадрів записуються пулом потоків (PIL і запис на диск відпускають GIL); шматок
+        дописується повністю, перш ніж його буфер повернеться конвертеру.
+        """
+        run = current_run()
+        # У режимі dry run потрібні лише вхідні параметри, кадри не конвертуються і не записуються
+        dry_run = getattr(_dry_run_state, "commands", None) is not None
+        if frame_transport == "raw file":
+            # Один файл сирих кадрів читається FFmpeg так само, як і канал stdin
+            raw_path = os.path.join(temp_dir, "frames.rgb")
+            input_args = self._raw_video_input_args(images, fps, bit_depth)[:-1] + [raw_path]
+            if dry_run: return input_args
+            with open(raw_path, 'wb') as f:
+                for chunk in self._iter_pipelined_frames(images, bit_depth):
+                    start = time.perf_counter()
+                    f.write(memoryview(chunk).cast('B'))
+                    if run is not None: run.add_time("write", time.perf_counter() - start)
+            return input_args
+
+        extension, write_frame = _SEQUENCE_WRITERS[frame_transport]
+        if extension == "ppm" and images.shape[3] == 4: extension = "pam"
+        pattern = os.path.join(temp_dir, f"frame_%06d.{extension}")
+        input_args = ['-framerate', str(fps), '-i', pattern]
+        if dry_run: return input_args
+        workers = get_config_int("PERFORMANCE", "conversion_threads", 0)
+        if workers <= 0: workers = min(4, os.cpu_count() or 1)
+        index = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in self._iter_pipelined_frames(images):
+                start = time.perf_counter()
+                futures = [pool.submit(write_frame, frame, pattern % (index + i)) for i, frame in enumerate(chunk)]
+                for future in futures: future.result()
+                index += len(chunk)
+                if run is not None: run.add_time("write", time.perf_counter() - start)
+        return input_args
 
 
 class SaveFramesToVideoFFmpeg(FFmpegConverterBase):
@@ -97,6 +558,17 @@ class SaveFramesToVideoFFmpeg(FFmpegConverterBase):
                 "audio_codec": (["aac", "mp3", "libopus", "copy"], {"default": "aac"}),
                 "audio_bitrate": (["96k", "128k", "160k", "192k", "256k", "320k"], {"default": "192k"}),
                 "output_file_opt": ("STRING", {"multiline": True, "default": "-preset medium", "tooltip": "Custom FFmpeg output options. One option per line, e.g., -preset slow"}),
+                "frame_transport": (FRAME_TRANSPORTS, {"default": "raw pipe", "tooltip": "How frames are passed to FFmpeg. 'raw pipe' streams uncompressed frames through stdin without temporary files (fastest). The other options write an intermediate file or image sequence to the temp directory ([PERFORMANCE] temp_dir)."}),
+                "segment_workers": ("INT", {"default": 1, "min": 1, "max": 32, "step": 1, "tooltip": "Number of FFmpeg processes encoding segments in parallel. 1 = single process (parallel segments disabled)."}),
+                "segment_length": ("INT", {"default": 240, "min": 1, "max": 100000, "step": 1, "tooltip": "Frames per segment in parallel mode. Rounded up to a multiple of the GOP size."}),
+                "gop_size": ("INT", {"default": 0, "min": 0, "max": 10000, "step": 1, "tooltip": "Keyframe interval (-g) in parallel mode. 0 = use the segment length. Segments always start on a keyframe."}),
+                "async_encode": ("BOOLEAN", {"default": False, "tooltip": "Queue the encode as a background job and return immediately. Job status: GET /san4itos/encode_jobs"}),
+                "renditions": ("STRING", {"multiline": True, "default": "", "tooltip": "Extra outputs encoded by the same FFmpeg process from a single pass over the frames. One per line: codec pixel_format crf format [ffmpeg options], e.g. libsvtav1 yuv420p10le 32 webm -preset 8"}),
+                "output_cache": (["off", "sampled", "full"], {"default": "off", "tooltip": "Reuse a previous output when frames, audio and encode settings are unchanged (prompt metadata is ignored). 'sampled' hashes a subset of pixels, 'full' hashes every pixel."}),
+                "input_bit_depth": (INPUT_BIT_DEPTHS, {"default": "auto", "tooltip": "Precision of the raw frames sent to FFmpeg. 'auto' sends 16-bit RGB (rgb48le) when the output pixel format has more than 8 bits per component (e.g. yuv420p10le), avoiding 8-bit banding; otherwise 8-bit RGB."}),
+                **FILTER_INPUTS,
+                "metadata_mode": METADATA_MODE_INPUT,
+                "dry_run": ("BOOLEAN", {"default": False, "tooltip": "Build the final FFmpeg command(s) and show them instead of encoding. Nothing is written to the output folder."}),
             },
             "hidden": {
                 "prompt": "PROMPT",
@@ -111,54 +583,129 @@ class SaveFramesToVideoFFmpeg(FFmpegConverterBase):
 
     def save_video(self, images, filename_prefix, fps, codec, pixel_format, crf, output_format, 
                    audio=None, audio_codec="aac", audio_bitrate="192k", output_file_opt="", 
-                   prompt=None, extra_pnginfo=None):
+                   frame_transport="raw pipe", segment_workers=1, segment_length=240, gop_size=0,
+                   async_encode=False, renditions="", output_cache="off", input_bit_depth="auto",
+                   crop="", resize_width=0, resize_height=0, resize_mode="stretch", resize_algorithm="bicubic",
+                   pad_color="black", output_fps=0.0, metadata_mode="embed", dry_run=False, prompt=None, extra_pnginfo=None):
         
         h, w = images[0].shape[0], images[0].shape[1]
         full_output_folder, filename_part, counter, subfolder, _ = folder_paths.get_save_image_path(filename_prefix, self.output_dir, w, h)
         video_filename = f"{filename_part}_{counter:05}_.{output_format}"
         video_full_path = os.path.join(full_output_folder, video_filename)
+        preview = [{"filename": video_filename, "subfolder": subfolder, "type": self.type}]
+
+        has_audio = audio and "waveform" in audio and audio["waveform"].numel() > 0
+        error = self._check_capabilities(codec, pixel_format, output_format, audio_codec if has_audio else None, output_file_opt)
+        if error: return error
+
+        filter_options = FilterOptions(crop, resize_width, resize_height, resize_mode, resize_algorithm, pad_color, output_fps)
+        try:
+            filter_options.validate()
+            rendition_specs = parse_renditions(renditions)
+        except ValueError as e:
+            log_node_error(self.NODE_LOG_PREFIX, str(e))
+            return {"ui": {"text": [str(e)]}}
+        for index, spec in enumerate(rendition_specs, start=1):
+            error = self._check_capabilities(spec["codec"], spec["pixel_format"], spec["output_format"], None, spec["output_file_opt"])
+            if error: return error
+            # Лічильник і суфікс у назві: наступний get_save_image_path бачить той самий номер і не перетирає файли
+            spec["path"] = os.path.join(full_output_folder, f"{filename_part}_{counter:05}_r{index}_.{spec['output_format']}")
+            preview.append({"filename": os.path.basename(spec["path"]), "subfolder": subfolder, "type": self.type})
+        output_paths = [video_full_path] + [spec["path"] for spec in rendition_specs]
+        # Один потік кадрів на всі виходи: 16 біт, якщо цього потребує хоч один з них
+        bit_depth = raw_input_bit_depth([pixel_format] + [spec["pixel_format"] for spec in rendition_specs], input_bit_depth)
+        if rendition_specs and output_cache != "off":
+            log_node_warning(self.NODE_LOG_PREFIX, "The output cache covers single-output encodes only. Disabled for this run.")
+            output_cache = "off"
+
+        # Prepare metadata
+        metadata_dict = {}
+        if not args.disable_metadata:
+            if prompt is not None:
+                metadata_dict["prompt"] = prompt
+            if extra_pnginfo is not None:
+                metadata_dict.update(extra_pnginfo)
+        embedded_tags = metadata_tags(metadata_dict, metadata_mode)
+
+        # Параметри відео будуються один раз: саме цей список передається у FFmpeg і входить у ключ кешу результатів
+        video_filters = filter_options.filters()
+        video_base_params = {'-c:v': codec, '-pix_fmt': pixel_format, '-crf': crf}
+        # Масштабування/обрізання/fps виконуються у FFmpeg перед кодуванням кожного виходу
+        if video_filters: video_base_params['-vf'] = ','.join(video_filters)
+        video_params = self._build_ffmpeg_params(video_base_params, output_file_opt, self.NODE_LOG_PREFIX)
+
+        def encode_file():
+            return self._encode_video(images, video_full_path, embedded_tags, fps, video_params,
+                                      audio, audio_codec, audio_bitrate, frame_transport,
+                                      segment_workers, segment_length, gop_size, rendition_specs, bit_depth, video_filters)
+
+        if dry_run:
+            with _dry_run_capture([]) as commands:
+                error = encode_file()
+            return error or _dry_run_result(commands, self.NODE_LOG_PREFIX)
+
+        def encode():
+            error = encode_outputs()
+            if not error and metadata_mode == "sidecar":
+                write_sidecars(metadata_dict, output_paths, self.NODE_LOG_PREFIX)
+            return error
+
+        def encode_outputs():
+            if output_cache == "off":
+                return self._run_instrumented(encode_file, output_paths, frames=len(images))
+            # Ключ кешу - фінальні параметри кодування без метаданих
+            cache_params = [fps, output_format, video_params]
+            if has_audio: cache_params += [audio_codec, audio_bitrate]
+            if segment_workers > 1: cache_params += [segment_workers, segment_length, gop_size]
+            if bit_depth > 8: cache_params += [bit_depth]
+            return self._run_instrumented(
+                lambda: self._encode_with_output_cache(output_cache, images, audio if has_audio else None, cache_params,
+                                                       embedded_tags, video_full_path, encode_file),
+                [video_full_path], frames=len(images))
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            for i, image_tensor in enumerate(images):
-                img_pil = Image.fromarray((image_tensor.cpu().numpy() * 255).astype(np.uint8))
-                img_pil.save(os.path.join(temp_dir, f"frame_{i:06d}.png"), "PNG")
+        if async_encode:
+            return self._submit_async_encode(video_full_path, encode, video_filename, total_frames=len(images), outputs=preview)
 
-            ffmpeg_cmd = [self.ffmpeg_executable_path, '-y', '-framerate', str(fps), '-i', os.path.join(temp_dir, 'frame_%06d.png')]
+        error = encode()
+        if error: return error
+        return {"ui": {"videos": preview}}
+
+    def _encode_video(self, images, video_full_path, embedded_tags, fps, video_params,
+                      audio, audio_codec, audio_bitrate, frame_transport,
+                      segment_workers, segment_length, gop_size, renditions=(), bit_depth=8, video_filters=()):
+        """video_params - готові параметри відеокодера з урахуванням output_file_opt (див. save_video)."""
+        use_pipe = frame_transport == "raw pipe"
+
+        with tempfile.TemporaryDirectory(dir=get_temp_root()) as temp_dir:
+            ffmpeg_cmd = [self.ffmpeg_executable_path, '-y']
+            if use_pipe:
+                ffmpeg_cmd.extend(self._raw_video_input_args(images, fps, bit_depth))
+            else:
+                ffmpeg_cmd.extend(self._write_intermediate_frames(images, temp_dir, frame_transport, fps, bit_depth))
             has_audio = audio and "waveform" in audio and audio["waveform"].numel() > 0
 
+            audio_input_args, audio_pipes = [], []
             if has_audio:
-                temp_audio_file = os.path.join(temp_dir, "temp_audio.wav")
-                waveform_tensor = audio["waveform"]
-                if waveform_tensor.shape[0] > 1:
-                    log_node_warning(self.NODE_LOG_PREFIX, f"Audio batch size is {waveform_tensor.shape[0]}. Using the first audio track.")
-                torchaudio.save(temp_audio_file, waveform_tensor[0].cpu(), audio["sample_rate"])
-                ffmpeg_cmd.extend(['-i', temp_audio_file])
-
-            # Prepare metadata
-            metadata_dict = {}
-            if not args.disable_metadata:
-                if prompt is not None:
-                    metadata_dict["prompt"] = prompt
-                if extra_pnginfo is not None:
-                    metadata_dict.update(extra_pnginfo)
-            
-            base_params = {
-                '-c:v': codec,
-                '-pix_fmt': pixel_format,
-                '-crf': crf
-            }
-            
-            # Add metadata to base_params if available
-            # NOTE: We use the "unsafe" format without explicit shell quoting here.
-            # This is required for ComfyUI's metadata reader to correctly parse the embedded JSON.
-            # While this could be fragile with special characters, it's the only format currently known to work.
-            if metadata_dict:
-                import json
-                metadata_json = json.dumps(metadata_dict)
-                base_params['-metadata'] = f'comment={metadata_json}'
-            
-            final_params = self._build_ffmpeg_params(base_params, output_file_opt, self.NODE_LOG_PREFIX)
-            ffmpeg_cmd.extend(final_params)
+                audio_input_args, audio_pipes = self._prepare_audio_input(audio, temp_dir, self.NODE_LOG_PREFIX)
+
+            if segment_workers > 1 and renditions:
+                log_node_warning(self.NODE_LOG_PREFIX, "Parallel segments do not support extra renditions. Using a single process.")
+            elif segment_workers > 1 and use_pipe and len(images) > segment_length:
+                return self._encode_parallel_segments(images, fps, video_params, embedded_tags,
+                                                      audio_input_args, audio_pipes, audio_codec, audio_bitrate, segment_workers,
+                                                      segment_length, gop_size, temp_dir, video_full_path, bit_depth)
+            elif segment_workers > 1 and not use_pipe:
+                log_node_warning(self.NODE_LOG_PREFIX, "Parallel segments require the 'raw pipe' frame transport. Using a single process.")
+
+            ffmpeg_cmd.extend(audio_input_args)
+            # Входи: кадри (0), аудіо (1, якщо є), файл метаданих
+            metadata_input_args, metadata_output_args = self._metadata_args(embedded_tags, temp_dir, 2 if has_audio else 1)
+            ffmpeg_cmd.extend(metadata_input_args)
+
+            ffmpeg_cmd.extend(video_params)
+            # '-map_metadata' з output_file_opt замінює вбудоване відображення метаданих
+            if metadata_output_args and '-map_metadata' not in video_params:
+                ffmpeg_cmd.extend(metadata_output_args)
 
             if has_audio:
                 ffmpeg_cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate, '-shortest'])
@@ -167,21 +714,104 @@ class SaveFramesToVideoFFmpeg(FFmpegConverterBase):
             
             ffmpeg_cmd.append(video_full_path)
 
-            error = self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX)
-            if error: return error
+            # Додаткові виходи того ж процесу: кадри декодуються і передаються один раз,
+            # FFmpeg сам роздає їх енкодерам усіх виходів
+            for spec in renditions:
+                rendition_params = {'-c:v': spec["codec"], '-pix_fmt': spec["pixel_format"], '-crf': spec["crf"]}
+                if video_filters: rendition_params['-vf'] = ','.join(video_filters)
+                if metadata_output_args: rendition_params['-map_metadata'] = metadata_output_args[1]
+                ffmpeg_cmd.extend(self._build_ffmpeg_params(rendition_params, spec["output_file_opt"], self.NODE_LOG_PREFIX))
+                if has_audio:
+                    rendition_audio_codec = audio_codec
+                    if not container_accepts(spec["output_format"], audio_codec=ENCODER_TO_CODEC.get(audio_codec, audio_codec)):
+                        rendition_audio_codec = 'libopus' if spec["output_format"] == 'webm' else 'aac'
+                    ffmpeg_cmd.extend(['-c:a', rendition_audio_codec, '-b:a', audio_bitrate, '-shortest'])
+                else:
+                    ffmpeg_cmd.extend(['-an'])
+                ffmpeg_cmd.append(spec["path"])
+
+            if use_pipe:
+                return self._execute_ffmpeg_with_stdin(ffmpeg_cmd, self._iter_raw_frames(images, bit_depth), self.NODE_LOG_PREFIX, audio_pipes)
+            return self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX, audio_pipes)
+
+    def _encode_parallel_segments(self, images, fps, video_params, embedded_tags,
+                                  audio_input_args, audio_pipes, audio_codec, audio_bitrate, segment_workers, segment_length,
+                                  gop_size, temp_dir, video_full_path, bit_depth=8):
+        """
+        Кодує батч кількома процесами FFmpeg паралельно. Межі сегментів вирівняні по GOP,
+        тому кожен сегмент починається з ключового кадру, а частини з однаковими параметрами
+        кодера з'єднуються concat демуксером без перекодування (-c copy). Аудіо і метадані
+        додаються один раз на етапі фінального муксування.
+        """
+        gop = gop_size if gop_size > 0 else segment_length
+        frames_per_segment = ((segment_length + gop - 1) // gop) * gop
+        boundaries = [(start, min(start + frames_per_segment, len(images))) for start in range(0, len(images), frames_per_segment)]
+        log_node_info(self.NODE_LOG_PREFIX, f"Encoding {len(boundaries)} segments of up to {frames_per_segment} frames with {segment_workers} workers (GOP {gop}).")
 
-            preview = [{"filename": video_filename, "subfolder": subfolder, "type": self.type}]
-            return {"ui": {"videos": preview}}
+        # Параметри кодера мають бути однаковими для всіх сегментів, інакше -c copy дасть несумісний потік.
+        # Параметри муксера, метаданих та аудіо з output_file_opt застосовуються лише при фінальному муксуванні
+        encoder_options, mux_options = split_mux_options(video_params, self.NODE_LOG_PREFIX)
+        encoder_params = self._build_ffmpeg_params({'-g': gop}, encoder_options, self.NODE_LOG_PREFIX)
+        segment_paths = [os.path.join(temp_dir, f"segment_{i:04d}.mkv") for i in range(len(boundaries))]
+        run = current_run()
+        job = current_job()
+        # Прогрес фонової задачі - сума кадрів усіх сегментів
+        progress = CombinedProgress(job, len(boundaries)) if job is not None else None
+        dry_run_commands = getattr(_dry_run_state, "commands", None)
+
+        def encode_segment(index):
+            start, end = boundaries[index]
+            segment_images = images[start:end]
+            cmd = [self.ffmpeg_executable_path, '-y'] + self._raw_video_input_args(segment_images, fps, bit_depth)
+            cmd += encoder_params + ['-an', segment_paths[index]]
+            with attached_run(run), attached_job(progress.part(index) if progress else None), _dry_run_capture(dry_run_commands):
+                return self._execute_ffmpeg_with_stdin(cmd, self._iter_raw_frames(segment_images, bit_depth, min(segment_workers, len(boundaries))), self.NODE_LOG_PREFIX)
+
+        with ThreadPoolExecutor(max_workers=segment_workers) as pool:
+            errors = [error for error in pool.map(encode_segment, range(len(boundaries))) if error]
+        if errors:
+            for pipe in audio_pipes: pipe.close()
+            return errors[0]
+
+        concat_list = os.path.join(temp_dir, "segments.txt")
+        with open(concat_list, 'w', encoding='utf-8') as f:
+            for path in segment_paths:
+                f.write("file '{}'\n".format(path.replace("'", "'\\''")))
+
+        has_audio = bool(audio_input_args)
+        metadata_input_args, metadata_output_args = self._metadata_args(embedded_tags, temp_dir, 2 if has_audio else 1)
+        ffmpeg_cmd = [self.ffmpeg_executable_path, '-y', '-f', 'concat', '-safe', '0', '-i', concat_list] + audio_input_args + metadata_input_args
+        mux_params = [('-map', '0:v')] + ([('-map', '1:a')] if has_audio else []) + [('-c:v', 'copy')]
+        if metadata_output_args: mux_params.append(('-map_metadata', metadata_output_args[1]))
+        if has_audio:
+            mux_params += [('-c:a', audio_codec), ('-b:a', audio_bitrate), ('-shortest', None)]
+        else:
+            mux_params.append(('-an', None))
+        ffmpeg_cmd.extend(self._build_ffmpeg_params(mux_params, mux_options, self.NODE_LOG_PREFIX))
+        ffmpeg_cmd.append(video_full_path)
+        return self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX, audio_pipes, stage="mux")
 
 
 class VideoPathWrapper:
-    def __init__(self, filepath):
+    def __init__(self, filepath, decode_options=None):
         self.filepath = filepath
+        self.decode_options = decode_options or DecodeOptions()
         self._is_direct_path = True
+        self._media_info = None
+
+    def get_media_info(self):
+        if self._media_info is None:
+            self._media_info = probe_media(get_ffmpeg_path(), self.filepath)
+        return self._media_info
 
     def get_components(self):
-        from comfy.comfy_types import InputImpl
-        return InputImpl.VideoFromFile(self.filepath).get_components()
+        if self.decode_options.is_default():
+            from comfy.comfy_types import InputImpl
+            return InputImpl.VideoFromFile(self.filepath).get_components()
+        info = self.get_media_info()
+        images = ChunkedVideoReader(get_ffmpeg_path(), self.filepath, info, self.decode_options).read_all()
+        audio = decode_audio(get_ffmpeg_path(), self.filepath, info, self.decode_options)
+        return make_video_components(images, audio, self.decode_options.frame_rate(info))
 
 
 class LoadVideoByPath_san4itos:
@@ -189,15 +819,25 @@ class LoadVideoByPath_san4itos:
     def INPUT_TYPES(cls):
         input_dir = folder_paths.get_input_directory()
         files = folder_paths.filter_files_content_types([f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))], ["video"])
-        return {"required": {"video_file": (sorted(files), {"video_upload": True})}}
+        return {
+            "required": {"video_file": (sorted(files), {"video_upload": True})},
+            "optional": {
+                "start_frame": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "tooltip": "First frame to load."}),
+                "frame_count": ("INT", {"default": 0, "min": 0, "max": 10000000, "step": 1, "tooltip": "Number of frames to load (after stride). 0 = until the end."}),
+                "stride": ("INT", {"default": 1, "min": 1, "max": 1000, "step": 1, "tooltip": "Keep every Nth frame. The frame rate is divided accordingly."}),
+                "width": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1, "tooltip": "Target width, scaled by FFmpeg. 0 = keep (or keep aspect ratio if only height is set)."}),
+                "height": ("INT", {"default": 0, "min": 0, "max": 16384, "step": 1, "tooltip": "Target height, scaled by FFmpeg. 0 = keep (or keep aspect ratio if only width is set)."}),
+                "chunk_size": ("INT", {"default": 16, "min": 1, "max": 4096, "step": 1, "tooltip": "Frames per decoded batch when frames are streamed."}),
+            },
+        }
 
     CATEGORY = "San4itos"
     RETURN_TYPES = ("VIDEO",)
     FUNCTION = "load_video"
 
-    def load_video(self, video_file):
+    def load_video(self, video_file, start_frame=0, frame_count=0, stride=1, width=0, height=0, chunk_size=16):
         video_path = folder_paths.get_annotated_filepath(video_file)
-        return (VideoPathWrapper(video_path),)
+        return (VideoPathWrapper(video_path, DecodeOptions(start_frame, frame_count, stride, width, height, chunk_size)),)
 
 
 class ConvertVideoFFmpeg(FFmpegConverterBase):
@@ -225,6 +865,12 @@ class ConvertVideoFFmpeg(FFmpegConverterBase):
                 "audio_codec": (["aac", "mp3", "libopus"], {"default": "aac"}),
                 "audio_bitrate": (["96k", "128k", "160k", "192k", "256k", "320k"], {"default": "192k"}),
                 "output_file_opt": ("STRING", {"multiline": True, "default": "-preset medium", "tooltip": "Custom FFmpeg output options. One option per line, e.g., -preset slow"}),
+                "async_encode": ("BOOLEAN", {"default": False, "tooltip": "Queue the conversion as a background job and return immediately. Job status: GET /san4itos/encode_jobs"}),
+                "smart_copy": ("BOOLEAN", {"default": True, "tooltip": "Copy the video stream without re-encoding when the source already has the requested codec and pixel format (remux only)."}),
+                **FILTER_INPUTS,
+                "input_bit_depth": (INPUT_BIT_DEPTHS, {"default": "auto", "tooltip": "Precision of the raw frames sent to FFmpeg in compatibility mode. 'auto' sends 16-bit RGB (rgb48le) when the output pixel format has more than 8 bits per component (e.g. yuv420p10le), avoiding 8-bit banding; otherwise 8-bit RGB."}),
+                "metadata_mode": METADATA_MODE_INPUT,
+                "dry_run": ("BOOLEAN", {"default": False, "tooltip": "Build the final FFmpeg command(s) and show them instead of encoding. Nothing is written to the output folder."}),
             },
             "hidden": {
                 "prompt": "PROMPT",
@@ -239,11 +885,27 @@ class ConvertVideoFFmpeg(FFmpegConverterBase):
 
     def convert_video(self, video, filename_prefix, codec, pixel_format, crf, output_format, audio_handling,
                       audio=None, audio_codec="aac", audio_bitrate="192k", output_file_opt="",
-                      prompt=None, extra_pnginfo=None):
+                      async_encode=False, smart_copy=True, crop="", resize_width=0, resize_height=0, resize_mode="stretch",
+                      resize_algorithm="bicubic", pad_color="black", output_fps=0.0, input_bit_depth="auto",
+                      metadata_mode="embed", dry_run=False, prompt=None, extra_pnginfo=None):
 
         full_output_folder, filename_part, counter, subfolder, _ = folder_paths.get_save_image_path(filename_prefix, self.output_dir, 0, 0)
         video_filename = f"{filename_part}_{counter:05}_.{output_format}"
         video_full_path = os.path.join(full_output_folder, video_filename)
+        preview = [{"filename": video_filename, "subfolder": subfolder, "type": self.type}]
+
+        # У режимі сумісності "copy" означає перекодування у libx264
+        is_direct_path = hasattr(video, '_is_direct_path')
+        check_codec = codec if is_direct_path or codec != 'copy' else 'libx264'
+        error = self._check_capabilities(check_codec, pixel_format, output_format,
+                                         audio_codec if audio_handling == "replace with new" else None, output_file_opt)
+        if error: return error
+        filter_options = FilterOptions(crop, resize_width, resize_height, resize_mode, resize_algorithm, pad_color, output_fps)
+        try:
+            filter_options.validate()
+        except ValueError as e:
+            log_node_error(self.NODE_LOG_PREFIX, str(e))
+            return {"ui": {"text": [str(e)]}}
 
         # Prepare metadata
         metadata_dict = {}
@@ -252,70 +914,148 @@ class ConvertVideoFFmpeg(FFmpegConverterBase):
                 metadata_dict["prompt"] = prompt
             if extra_pnginfo is not None:
                 metadata_dict.update(extra_pnginfo)
+        embedded_tags = metadata_tags(metadata_dict, metadata_mode)
+
+        if dry_run:
+            with _dry_run_capture([]) as commands:
+                error = self._convert_to_file(video, video_full_path, embedded_tags, codec, pixel_format, crf, audio_handling,
+                                              audio, audio_codec, audio_bitrate, output_file_opt, output_format, smart_copy,
+                                              input_bit_depth, filter_options)
+            return error or _dry_run_result(commands, self.NODE_LOG_PREFIX)
+
+        def convert():
+            error = self._run_instrumented(
+                lambda: self._convert_to_file(video, video_full_path, embedded_tags, codec, pixel_format, crf, audio_handling,
+                                              audio, audio_codec, audio_bitrate, output_file_opt, output_format, smart_copy,
+                                              input_bit_depth, filter_options),
+                [video_full_path])
+            if not error and metadata_mode == "sidecar":
+                write_sidecars(metadata_dict, [video_full_path], self.NODE_LOG_PREFIX)
+            return error
+
+        if async_encode:
+            return self._submit_async_encode(video_full_path, convert, video_filename, outputs=preview)
+
+        error = convert()
+        if error: return error
+        return {"ui": {"videos": preview}}
+
+    def _smart_copy_applies(self, info, options, codec, pixel_format, output_format, output_file_opt):
+        """Чи можна замість перекодування скопіювати відеопотік (лише зміна контейнера)."""
+        if codec == 'copy' or not options.is_default():
+            return False
+        blocking = option_flags(output_file_opt) & {canonical_flag(flag) for flag in SMART_COPY_BLOCKING_FLAGS}
+        reason = stream_copy_reason(info, codec, pixel_format, output_format)
+        if reason and blocking:
+            log_node_info(self.NODE_LOG_PREFIX, f"Smart copy skipped: custom options {sorted(blocking)} require re-encoding.")
+            return False
+        if reason:
+            log_node_info(self.NODE_LOG_PREFIX, f"Smart copy: {reason}. Copying the video stream instead of re-encoding.")
+        return reason is not None
 
+    def _direct_path_command(self, video, video_full_path, temp_dir, embedded_tags, codec, pixel_format, crf, audio_handling,
+                             audio_codec, audio_bitrate, output_file_opt, output_format, smart_copy, filter_options):
+        """
+        Команда FFmpeg прямого шляху: файл -> файл без декодування кадрів у Python.
+        Файл метаданих пишеться в temp_dir. RuntimeError, якщо вхідне відео не вдалося проаналізувати,
+        а аналіз потрібен для вибірки кадрів; для smart copy помилка аналізу означає звичайне перекодування.
+        """
+        options = video.decode_options
+        try:
+            # Аналіз ffprobe кешується за шляхом, mtime та розміром файлу
+            info = video.get_media_info() if smart_copy or not options.is_default() else None
+        except Exception as e:
+            if not options.is_default():
+                raise RuntimeError(f"Could not read video '{os.path.basename(video.filepath)}': {e}") from e
+            log_node_warning(self.NODE_LOG_PREFIX, f"Could not probe '{os.path.basename(video.filepath)}' for smart copy ({e}). Re-encoding instead.")
+            info, smart_copy = None, False
+        if smart_copy and filter_options.is_default() and self._smart_copy_applies(info, options, codec, pixel_format, output_format, output_file_opt):
+            codec, pixel_format = 'copy', 'copy'
+        elif not options.is_default() and codec == 'copy':
+            log_node_warning(self.NODE_LOG_PREFIX, "Stride and resize need re-encoding and are ignored with codec 'copy'. The frame range is cut at the nearest keyframes.")
+        if not filter_options.is_default() and codec == 'copy':
+            log_node_warning(self.NODE_LOG_PREFIX, "Crop, resize and fps conversion need re-encoding and are ignored with codec 'copy'.")
+        range_info = None if options.is_default() else info
+        ffmpeg_cmd = [self.ffmpeg_executable_path, '-y'] + (options.input_args(range_info) if range_info else []) + ['-i', video.filepath]
+        metadata_input_args, metadata_output_args = self._metadata_args(embedded_tags, temp_dir, 1)
+        ffmpeg_cmd.extend(metadata_input_args)
+
+        # Без явного '-c:v copy' FFmpeg перекодував би відео енкодером за замовчуванням
+        base_params = {'-c:v': codec}
+        if pixel_format != 'copy' and codec != 'copy': base_params['-pix_fmt'] = pixel_format
+        if codec not in ['copy']: base_params['-crf'] = crf
+        if codec != 'copy':
+            # Спочатку вибірка кадрів вузла завантаження, потім фільтри цього вузла
+            filters = (options.video_filters(range_info) if range_info is not None else []) + filter_options.filters()
+            if filters: base_params['-vf'] = ','.join(filters)
+        base_params = list(base_params.items())
+        if metadata_output_args:
+            # Окреме відображення вимикає копіювання тегів джерела за замовчуванням; другим відображенням
+            # теги джерела (title, creation_time...) повертаються - FFmpeg не перезаписує вже задані ключі
+            base_params += [('-map_metadata', metadata_output_args[1]), ('-map_metadata', '0')]
+
+        final_params = self._build_ffmpeg_params(base_params, output_file_opt, self.NODE_LOG_PREFIX)
+        ffmpeg_cmd.extend(final_params)
+
+        if audio_handling == "copy original":
+            source_audio_codec = info.get("audio_codec") if info else None
+            if source_audio_codec and output_format and not container_accepts(output_format, audio_codec=source_audio_codec):
+                # Наприклад, aac у webm: відео копіюється, а аудіо перекодовується
+                if not container_accepts(output_format, audio_codec=ENCODER_TO_CODEC.get(audio_codec, audio_codec)):
+                    audio_codec = 'libopus' if output_format == 'webm' else 'aac'
+                log_node_info(self.NODE_LOG_PREFIX, f"Audio codec '{source_audio_codec}' cannot be copied into {output_format}. Re-encoding audio with {audio_codec}.")
+                ffmpeg_cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate])
+            else:
+                ffmpeg_cmd.extend(['-c:a', 'copy'])
+        elif audio_handling == "remove audio": ffmpeg_cmd.extend(['-an'])
+        elif audio_handling == "replace with new": log_node_warning(self.NODE_LOG_PREFIX, "Audio replacement is not supported in direct path mode. Audio will be copied.")
+        if range_info is not None: ffmpeg_cmd.extend(options.output_args(range_info, count_frames=not filter_options.fps or codec == 'copy'))
+
+        ffmpeg_cmd.append(video_full_path)
+        return ffmpeg_cmd
+
+    def _convert_to_file(self, video, video_full_path, embedded_tags, codec, pixel_format, crf, audio_handling,
+                         audio, audio_codec, audio_bitrate, output_file_opt, output_format=None, smart_copy=False,
+                         input_bit_depth="auto", filter_options=None):
         is_direct_path = hasattr(video, '_is_direct_path')
+        filter_options = filter_options or FilterOptions()
 
         error = None
         if is_direct_path:
             log_node_info(self.NODE_LOG_PREFIX, "Direct path detected. Using fast conversion.")
-            ffmpeg_cmd = [self.ffmpeg_executable_path, '-y', '-i', video.filepath]
-            
-            base_params = {}
-            if codec != 'copy': base_params['-c:v'] = codec
-            if pixel_format != 'copy': base_params['-pix_fmt'] = pixel_format
-            if codec not in ['copy']: base_params['-crf'] = crf
-
-            # Add metadata to base_params if available
-            # NOTE: We use the "unsafe" format without explicit shell quoting here.
-            # This is required for ComfyUI's metadata reader to correctly parse the embedded JSON.
-            # While this could be fragile with special characters, it's the only format currently known to work.
-            if metadata_dict:
-                if os.name == 'nt':
-                    log_node_warning(self.NODE_LOG_PREFIX, "Skipping metadata on Windows due to command line length limitations.")
-                else:
-                    import json
-                    metadata_json = json.dumps(metadata_dict)
-                    base_params['-metadata'] = f'comment={metadata_json}'
-
-            final_params = self._build_ffmpeg_params(base_params, output_file_opt, self.NODE_LOG_PREFIX)
-            ffmpeg_cmd.extend(final_params)
-
-            if audio_handling == "copy original": ffmpeg_cmd.extend(['-c:a', 'copy'])
-            elif audio_handling == "remove audio": ffmpeg_cmd.extend(['-an'])
-            elif audio_handling == "replace with new": log_node_warning(self.NODE_LOG_PREFIX, "Audio replacement is not supported in direct path mode. Audio will be copied.")
-            
-            ffmpeg_cmd.append(video_full_path)
-            error = self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX)
+            # Тимчасова директорія - для файлу метаданих (FFMETADATA1)
+            with tempfile.TemporaryDirectory(dir=get_temp_root()) as temp_dir:
+                try:
+                    ffmpeg_cmd = self._direct_path_command(video, video_full_path, temp_dir, embedded_tags, codec, pixel_format, crf,
+                                                           audio_handling, audio_codec, audio_bitrate, output_file_opt, output_format,
+                                                           smart_copy, filter_options)
+                except RuntimeError as e:
+                    return {"ui": {"text": [str(e)]}}
+                error = self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX)
         else:
             log_node_info(self.NODE_LOG_PREFIX, "Standard video object detected. Using compatibility mode.")
             components = video.get_components()
             images, source_audio, source_fps = components.images, components.audio, float(components.frame_rate)
             
-            with tempfile.TemporaryDirectory() as temp_dir:
-                for i, image_tensor in enumerate(images):
-                    Image.fromarray((image_tensor.cpu().numpy() * 255).astype(np.uint8)).save(os.path.join(temp_dir, f"frame_{i:06d}.png"))
-
-                ffmpeg_cmd = [self.ffmpeg_executable_path, '-y', '-framerate', str(source_fps), '-i', os.path.join(temp_dir, 'frame_%06d.png')]
+            with tempfile.TemporaryDirectory(dir=get_temp_root()) as temp_dir:
+                bit_depth = raw_input_bit_depth([pixel_format], input_bit_depth)
+                ffmpeg_cmd = [self.ffmpeg_executable_path, '-y'] + self._raw_video_input_args(images, source_fps, bit_depth)
                 
                 final_audio = source_audio if audio_handling == "copy original" else audio if audio_handling == "replace with new" else None
                 has_audio = final_audio and "waveform" in final_audio and final_audio["waveform"].numel() > 0
 
+                audio_pipes = []
                 if has_audio:
-                    temp_audio_file = os.path.join(temp_dir, "temp_audio.wav")
-                    torchaudio.save(temp_audio_file, final_audio["waveform"][0].cpu(), final_audio["sample_rate"])
-                    ffmpeg_cmd.extend(['-i', temp_audio_file])
+                    audio_input_args, audio_pipes = self._prepare_audio_input(final_audio, temp_dir, self.NODE_LOG_PREFIX)
+                    ffmpeg_cmd.extend(audio_input_args)
 
                 base_params = {'-c:v': codec if codec != "copy" else "libx264", '-pix_fmt': pixel_format, '-crf': crf}
-                
-                # Add metadata to base_params if available
-                # NOTE: We use the "unsafe" format without explicit shell quoting here.
-                # This is required for ComfyUI's metadata reader to correctly parse the embedded JSON.
-                # While this could be fragile with special characters, it's the only format currently known to work.
-                if metadata_dict:
-                    import json
-                    metadata_json = json.dumps(metadata_dict)
-                    base_params['-metadata'] = f'comment={metadata_json}'
-                    
+                if not filter_options.is_default(): base_params['-vf'] = ','.join(filter_options.filters())
+
+                metadata_input_args, metadata_output_args = self._metadata_args(embedded_tags, temp_dir, 2 if has_audio else 1)
+                ffmpeg_cmd.extend(metadata_input_args)
+                if metadata_output_args: base_params['-map_metadata'] = metadata_output_args[1]
+
                 final_params = self._build_ffmpeg_params(base_params, output_file_opt, self.NODE_LOG_PREFIX)
                 ffmpeg_cmd.extend(final_params)
 
@@ -323,21 +1063,381 @@ class ConvertVideoFFmpeg(FFmpegConverterBase):
                 else: ffmpeg_cmd.extend(['-an'])
                 
                 ffmpeg_cmd.append(video_full_path)
-                error = self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX)
+                error = self._execute_ffmpeg_with_stdin(ffmpeg_cmd, self._iter_raw_frames(images, bit_depth), self.NODE_LOG_PREFIX, audio_pipes)
 
-        if error: return error
+        return error
 
-        preview = [{"filename": video_filename, "subfolder": subfolder, "type": self.type}]
-        return {"ui": {"videos": preview}}
+
+class BatchConvertVideosFFmpeg(ConvertVideoFFmpeg):
+    """
+    Конвертує кілька файлів прямим шляхом ConvertVideoFFmpeg. Одночасно працює обмежена кількість
+    процесів FFmpeg, кожен з власним лімітом потоків (-threads), щоб разом вони займали приблизно
+    всі ядра, а не кожен - усі. Актуальні виходи (те саме джерело і ті самі параметри) пропускаються.
+    """
+    NODE_LOG_PREFIX = "BatchConvertFFMPEG"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "input_paths": ("STRING", {"multiline": True, "default": "*.mp4", "tooltip": "One file path or glob pattern per line ('**' matches subfolders), relative to the ComfyUI input folder. Paths outside the input folder are rejected. Lines starting with '#' are ignored."}),
+                "output_subfolder": ("STRING", {"default": "batch_conv", "tooltip": "Folder inside the output directory. Each input is written as <input name>.<format>, so repeated runs update the same files."}),
+                "codec": (["libx264", "libx265", "libvpx-vp9", "libsvtav1", "copy"], {"default": "libx264"}),
+                "pixel_format": (["yuv420p", "yuv422p", "yuv444p", "yuv420p10le", "yuv422p10le", "rgb24", "copy"], {"default": "yuv420p"}),
+                "crf": ("INT", {"default": 23, "min": 0, "max": 63, "step": 1}),
+                "output_format": (["mp4", "webm", "mov", "avi", "mkv"], {"default": "mp4"}),
+                "audio_handling": (["copy original", "remove audio"], {"default": "copy original"}),
+            },
+            "optional": {
+                "audio_codec": (["aac", "mp3", "libopus"], {"default": "aac"}),
+                "audio_bitrate": (["96k", "128k", "160k", "192k", "256k", "320k"], {"default": "192k"}),
+                "output_file_opt": ("STRING", {"multiline": True, "default": "-preset medium", "tooltip": "Custom FFmpeg output options applied to every file."}),
+                "smart_copy": ("BOOLEAN", {"default": True, "tooltip": "Copy the video stream without re-encoding when a source already has the requested codec and pixel format (remux only)."}),
+                "max_workers": ("INT", {"default": 0, "min": 0, "max": 256, "step": 1, "tooltip": "FFmpeg processes running at the same time. 0 = auto (one per CPU core, or cores / threads_per_job)."}),
+                "threads_per_job": ("INT", {"default": 0, "min": 0, "max": 256, "step": 1, "tooltip": "Threads given to each FFmpeg process (-threads). 0 = auto: CPU cores / workers, so all jobs together use about all cores."}),
+                "skip_up_to_date": ("BOOLEAN", {"default": True, "tooltip": "Skip inputs whose output was already produced from the same source file (size and modification time) with the same settings and has not changed since. Metadata changes alone do not trigger re-conversion."}),
+                **FILTER_INPUTS,
+                "metadata_mode": METADATA_MODE_INPUT,
+                "dry_run": ("BOOLEAN", {"default": False, "tooltip": "Build the FFmpeg commands for the files that would be converted and show them instead of encoding."}),
+            },
+            "hidden": {
+                "prompt": "PROMPT",
+                "extra_pnginfo": "EXTRA_PNGINFO"
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("report",)
+    FUNCTION = "convert_batch"
+    OUTPUT_NODE = True
+    CATEGORY = "San4itos"
+
+    def convert_batch(self, input_paths, output_subfolder, codec, pixel_format, crf, output_format, audio_handling,
+                      audio_codec="aac", audio_bitrate="192k", output_file_opt="", smart_copy=True, max_workers=0,
+                      threads_per_job=0, skip_up_to_date=True, crop="", resize_width=0, resize_height=0, resize_mode="stretch",
+                      resize_algorithm="bicubic", pad_color="black", output_fps=0.0, metadata_mode="embed", dry_run=False,
+                      prompt=None, extra_pnginfo=None):
+        error = self._check_capabilities(codec, pixel_format, output_format, None, output_file_opt)
+        if error: return self._batch_error(error["ui"]["text"])
+        filter_options = FilterOptions(crop, resize_width, resize_height, resize_mode, resize_algorithm, pad_color, output_fps)
+        try:
+            filter_options.validate()
+        except ValueError as e:
+            log_node_error(self.NODE_LOG_PREFIX, str(e))
+            return self._batch_error([str(e)])
+
+        output_root = os.path.realpath(self.output_dir)
+        output_folder = os.path.realpath(os.path.join(output_root, output_subfolder.strip()))
+        if os.path.commonpath([output_root, output_folder]) != output_root:
+            message = f"Output subfolder '{output_subfolder}' is outside the output directory."
+            log_node_error(self.NODE_LOG_PREFIX, message)
+            return self._batch_error([message])
+        subfolder = os.path.relpath(output_folder, output_root)
+        subfolder = "" if subfolder == "." else subfolder
+
+        sources, unmatched, rejected = expand_input_paths(input_paths, folder_paths.get_input_directory())
+        for pattern in unmatched: log_node_warning(self.NODE_LOG_PREFIX, f"No video files match '{pattern}'.")
+        for pattern in rejected: log_node_error(self.NODE_LOG_PREFIX, f"'{pattern}' points outside the input directory. Ignoring.")
+        if not sources:
+            return self._batch_error(["No input videos found."] + [f"Outside the input directory: {pattern}" for pattern in rejected], unmatched, rejected)
+
+        metadata_dict = {}
+        if not args.disable_metadata:
+            if prompt is not None:
+                metadata_dict["prompt"] = prompt
+            if extra_pnginfo is not None:
+                metadata_dict.update(extra_pnginfo)
+        embedded_tags = metadata_tags(metadata_dict, metadata_mode)
+
+        # Метадані не входять у відбиток, як і в ключ кешу результатів
+        params_hash = params_fingerprint([codec, pixel_format, crf, output_format, audio_handling, audio_codec, audio_bitrate,
+                                          output_file_opt, smart_copy, filter_options.filters(), metadata_mode])
+        manifest = get_batch_manifest()
+        files, jobs = [], []
+        for source, output_path in zip(sources, output_paths_for(sources, output_folder, output_format)):
+            entry = {"input": source, "output": output_path, "status": "pending", "seconds": 0.0, "error": None}
+            files.append(entry)
+            if output_path == source:
+                entry.update(status="failed", error="Output would overwrite the source file.")
+            elif skip_up_to_date and manifest.is_up_to_date(source, output_path, params_hash):
+                entry["status"] = "skipped"
+            else:
+                jobs.append(entry)
+
+        workers, threads = plan_workers(len(jobs), max_workers, threads_per_job)
+        # Ліміт потоків ставиться перед параметрами користувача, тож явний -threads у output_file_opt має пріоритет
+        job_file_opt = f"-threads {threads} {output_file_opt or ''}"
+        if jobs: log_node_info(self.NODE_LOG_PREFIX, f"Converting {len(jobs)} of {len(files)} files with {workers} workers x {threads} threads.")
+        if not dry_run: os.makedirs(output_folder, exist_ok=True)
+
+        def convert_one(entry, run, dry_run_commands):
+            start = time.perf_counter()
+            output_path = entry["output"]
+            # Незавершений файл не повинен виглядати актуальним результатом - пишемо поруч і перейменовуємо
+            stem, extension = os.path.splitext(os.path.basename(output_path))
+            part_path = os.path.join(os.path.dirname(output_path), f".{stem}.part{extension}")
+            with attached_run(run), _dry_run_capture(dry_run_commands), tempfile.TemporaryDirectory(dir=get_temp_root()) as temp_dir:
+                try:
+                    ffmpeg_cmd = self._direct_path_command(VideoPathWrapper(entry["input"]), part_path, temp_dir, embedded_tags, codec,
+                                                           pixel_format, crf, audio_handling, audio_codec, audio_bitrate, job_file_opt,
+                                                           output_format, smart_copy, filter_options)
+                    error = self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX)
+                    error = error["ui"]["text"][0] if error else None
+                except RuntimeError as e:
+                    error = str(e)
+            if not error and dry_run_commands is None:
+                try:
+                    os.replace(part_path, output_path)
+                except OSError as e:
+                    error = f"Could not move the result to '{output_path}': {e}"
+            if error:
+                if os.path.exists(part_path): os.remove(part_path)
+                entry.update(status="failed", error=error)
+            elif dry_run_commands is None:
+                manifest.record(entry["input"], output_path, params_hash)
+                entry["status"] = "converted"
+            else:
+                entry["status"] = "planned"
+            entry["seconds"] = round(time.perf_counter() - start, 3)
+
+        def run_jobs():
+            run = current_run()
+            dry_run_commands = getattr(_dry_run_state, "commands", None)
+            if jobs:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(lambda entry: convert_one(entry, run, dry_run_commands), jobs))
+            failed = [entry for entry in files if entry["status"] == "failed"]
+            return {"ui": {"text": [entry["error"] for entry in failed]}} if failed else None
+
+        batch_start = time.perf_counter()
+        if dry_run:
+            with _dry_run_capture([]) as commands:
+                run_jobs()
+            result = _dry_run_result(commands, self.NODE_LOG_PREFIX)
+        else:
+            self._run_instrumented(run_jobs, [entry["output"] for entry in jobs])
+            converted = [entry["output"] for entry in files if entry["status"] == "converted"]
+            if metadata_mode == "sidecar":
+                write_sidecars(metadata_dict, converted, self.NODE_LOG_PREFIX)
+            result = {"ui": {"text": [], "videos": [{"filename": os.path.basename(entry["output"]), "subfolder": subfolder, "type": self.type}
+                                                    for entry in files if entry["status"] in ("converted", "skipped")]}}
+
+        counts = {status: sum(1 for entry in files if entry["status"] == status) for status in ("converted", "skipped", "failed", "planned")}
+        report = {"total": len(files), **counts, "seconds": round(time.perf_counter() - batch_start, 3),
+                  "workers": workers, "threads_per_job": threads, "unmatched": unmatched, "rejected": rejected, "files": files}
+        summary = f"{len(files)} files: " + ", ".join(f"{count} {status}" for status, count in counts.items() if count or status != "planned") + f" in {report['seconds']:.1f}s."
+        (log_node_warning if counts["failed"] else log_node_success)(self.NODE_LOG_PREFIX, summary)
+        result["ui"]["text"] = ([summary] + [f"Outside the input directory: {pattern}" for pattern in rejected]
+                                + [f"{os.path.basename(entry['input'])}: {entry['error']}" for entry in files if entry["status"] == "failed"] + result["ui"]["text"])
+        result["result"] = (json.dumps(report, indent=2),)
+        return result
+
+    def _batch_error(self, messages, unmatched=(), rejected=()):
+        """Помилка всього пакета: текст у вузлі та звіт без файлів (вихід report потрібен наступним вузлам)."""
+        report = {"total": 0, "errors": messages, "unmatched": list(unmatched), "rejected": list(rejected), "files": []}
+        return {"ui": {"text": messages}, "result": (json.dumps(report, indent=2),)}
+
+
+class StartEncodeSession(FFmpegConverterBase):
+    NODE_LOG_PREFIX = "EncodeSessionStart"
+
+    def __init__(self):
+        self.output_dir = folder_paths.get_output_directory()
+        self.type = "output"
+        self.ffmpeg_executable_path = get_ffmpeg_path()
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "filename_prefix": ("STRING", {"default": "VID"}),
+                "fps": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 120.0, "step": 1.0}),
+                "codec": (["libx264", "libx265", "libvpx-vp9", "libsvtav1"], {"default": "libx264"}),
+                "pixel_format": (["yuv420p", "yuv422p", "yuv444p", "yuv420p10le", "yuv422p10le", "yuv444p10le", "rgb24"], {"default": "yuv420p"}),
+                "crf": ("INT", {"default": 23, "min": 0, "max": 63, "step": 1}),
+                "output_format": (["mp4", "webm", "mov", "avi", "mkv"], {"default": "mp4"}),
+            },
+            "optional": {
+                "output_file_opt": ("STRING", {"multiline": True, "default": "-preset medium", "tooltip": "Custom FFmpeg output options. One option per line, e.g., -preset slow"}),
+                "input_bit_depth": (INPUT_BIT_DEPTHS, {"default": "auto", "tooltip": "Precision of the raw frames sent to FFmpeg by the append node. 'auto' sends 16-bit RGB (rgb48le) for pixel formats with more than 8 bits per component."}),
+            },
+        }
+
+    RETURN_TYPES = ("ENCODE_SESSION",)
+    RETURN_NAMES = ("session",)
+    FUNCTION = "start_session"
+    CATEGORY = "San4itos"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Кожен запуск відкриває нову сесію, результат не можна брати з кешу ComfyUI
+        return float("NaN")
+
+    def start_session(self, filename_prefix, fps, codec, pixel_format, crf, output_format, output_file_opt="", input_bit_depth="auto"):
+        errors = validate_encode_params(self.ffmpeg_executable_path, codec, pixel_format, output_format,
+                                        None, output_file_opt, self.NODE_LOG_PREFIX)
+        if errors:
+            raise ValueError("; ".join(errors))
+        full_output_folder, filename_part, counter, subfolder, _ = folder_paths.get_save_image_path(filename_prefix, self.output_dir, 0, 0)
+        video_filename = f"{filename_part}_{counter:05}_.{output_format}"
+        video_full_path = os.path.join(full_output_folder, video_filename)
+        # Заглушка резервує лічильник, поки сесія не завершена
+        open(video_full_path, 'ab').close()
+        settings = {"fps": fps, "codec": codec, "pixel_format": pixel_format, "crf": crf, "output_format": output_format,
+                    "output_file_opt": output_file_opt, "bit_depth": raw_input_bit_depth([pixel_format], input_bit_depth), "preview": {"filename": video_filename, "subfolder": subfolder, "type": self.type}}
+        return (open_session(settings, video_full_path),)
+
+
+class AppendFramesToEncodeSession(FFmpegConverterBase):
+    NODE_LOG_PREFIX = "EncodeSessionAppend"
+
+    def __init__(self):
+        self.ffmpeg_executable_path = get_ffmpeg_path()
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"session": ("ENCODE_SESSION",), "images": ("IMAGE",)}}
+
+    RETURN_TYPES = ("ENCODE_SESSION", "INT")
+    RETURN_NAMES = ("session", "frames_written")
+    FUNCTION = "append_frames"
+    CATEGORY = "San4itos"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return float("NaN")
+
+    def append_frames(self, session, images):
+        encode_session = get_session(session)
+        if encode_session is None:
+            raise ValueError(f"{session} is not open (already finalized, aborted or unknown).")
+        with encode_session.lock:
+            if encode_session.process is None:
+                settings = encode_session.settings
+                ffmpeg_cmd = [self.ffmpeg_executable_path, '-y'] + self._raw_video_input_args(images, settings["fps"], settings["bit_depth"])
+                base_params = {'-c:v': settings["codec"], '-pix_fmt': settings["pixel_format"], '-crf': settings["crf"]}
+                ffmpeg_cmd.extend(self._build_ffmpeg_params(base_params, settings["output_file_opt"], self.NODE_LOG_PREFIX))
+                ffmpeg_cmd.extend(['-an', encode_session.video_path])
+                encode_session.start(ffmpeg_cmd, images.shape[1:])
+            elif tuple(images.shape[1:]) != encode_session.frame_shape:
+                raise ValueError(f"Frame size {tuple(images.shape[1:])} does not match the session's {encode_session.frame_shape}.")
+            try:
+                written = encode_session.write(self._iter_raw_frames(images, encode_session.settings["bit_depth"]))
+            except OSError:
+                # FFmpeg завершився під час запису - сесію вже не врятувати
+                close_session(session)
+                encode_session.close_video()
+                log_node_error(self.NODE_LOG_PREFIX, f"ffmpeg stopped accepting frames:\n{encode_session.stderr_text()}")
+                encode_session.abort()
+                raise RuntimeError(f"ffmpeg failed in {session}. Check console for details.")
+        log_node_info(self.NODE_LOG_PREFIX, f"Appended {written} frames to session {session.session_id} ({encode_session.frames_written} total).")
+        return (session, encode_session.frames_written)
+
+
+class FinalizeEncodeSession(FFmpegConverterBase):
+    NODE_LOG_PREFIX = "EncodeSessionFinalize"
+
+    def __init__(self):
+        self.ffmpeg_executable_path = get_ffmpeg_path()
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {"session": ("ENCODE_SESSION",)},
+            "optional": {
+                "audio": ("AUDIO",),
+                "audio_codec": (["aac", "mp3", "libopus"], {"default": "aac"}),
+                "audio_bitrate": (["96k", "128k", "160k", "192k", "256k", "320k"], {"default": "192k"}),
+                "metadata_mode": METADATA_MODE_INPUT,
+            },
+            "hidden": {
+                "prompt": "PROMPT",
+                "extra_pnginfo": "EXTRA_PNGINFO"
+            }
+        }
+
+    RETURN_TYPES = ()
+    FUNCTION = "finalize_session"
+    OUTPUT_NODE = True
+    CATEGORY = "San4itos"
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        return float("NaN")
+
+    def finalize_session(self, session, audio=None, audio_codec="aac", audio_bitrate="192k", metadata_mode="embed",
+                         prompt=None, extra_pnginfo=None):
+        encode_session = close_session(session)
+        if encode_session is None:
+            return {"ui": {"text": [f"{session} is not open (already finalized, aborted or unknown)."]}}
+        with encode_session.lock:
+            if encode_session.frames_written == 0:
+                encode_session.abort()
+                return {"ui": {"text": ["No frames were appended to the encode session."]}}
+            returncode = encode_session.close_video()
+            if returncode != 0:
+                error = self._handle_ffmpeg_result(returncode, "", encode_session.stderr_text(), self.NODE_LOG_PREFIX)
+                encode_session.abort()
+                return error
+
+            metadata_dict = {}
+            if not args.disable_metadata:
+                if prompt is not None:
+                    metadata_dict["prompt"] = prompt
+                if extra_pnginfo is not None:
+                    metadata_dict.update(extra_pnginfo)
+
+            has_audio = audio and "waveform" in audio and audio["waveform"].numel() > 0
+            output_format = encode_session.settings["output_format"]
+            with tempfile.TemporaryDirectory(dir=get_temp_root()) as temp_dir:
+                # Відео вже закодоване - лише копіюється разом з новим аудіо та метаданими
+                ffmpeg_cmd = [self.ffmpeg_executable_path, '-y', '-i', encode_session.video_path]
+                audio_pipes = []
+                if has_audio:
+                    audio_input_args, audio_pipes = self._prepare_audio_input(audio, temp_dir, self.NODE_LOG_PREFIX)
+                    ffmpeg_cmd.extend(audio_input_args)
+                metadata_input_args, metadata_output_args = self._metadata_args(metadata_tags(metadata_dict, metadata_mode),
+                                                                                temp_dir, 2 if has_audio else 1)
+                ffmpeg_cmd.extend(metadata_input_args)
+                if has_audio:
+                    ffmpeg_cmd.extend(['-map', '0:v', '-map', '1:a'])
+                ffmpeg_cmd.extend(['-c:v', 'copy'] + metadata_output_args)
+                if has_audio:
+                    if not container_accepts(output_format, audio_codec=ENCODER_TO_CODEC.get(audio_codec, audio_codec)):
+                        audio_codec = 'libopus' if output_format == 'webm' else 'aac'
+                    ffmpeg_cmd.extend(['-c:a', audio_codec, '-b:a', audio_bitrate, '-shortest'])
+                else:
+                    ffmpeg_cmd.extend(['-an'])
+                ffmpeg_cmd.append(encode_session.output_path)
+                error = self._run_instrumented(
+                    lambda: self._execute_ffmpeg_command(ffmpeg_cmd, self.NODE_LOG_PREFIX, audio_pipes, stage="mux"),
+                    [encode_session.output_path], frames=encode_session.frames_written)
+            if error:
+                encode_session.abort()
+                return error
+            encode_session.state = STATE_FINALIZED
+            encode_session.cleanup()
+        if metadata_mode == "sidecar":
+            write_sidecars(metadata_dict, [encode_session.output_path], self.NODE_LOG_PREFIX)
+        log_node_success(self.NODE_LOG_PREFIX, f"Session {encode_session.session_id} finalized: {encode_session.frames_written} frames -> {encode_session.output_path}")
+        return {"ui": {"videos": [encode_session.settings["preview"]]}}
 
 
 NODE_CLASS_MAPPINGS = {
     "SaveFramesToVideoFFmpeg_san4itos": SaveFramesToVideoFFmpeg,
     "ConvertVideoFFmpeg_san4itos": ConvertVideoFFmpeg,
+    "BatchConvertVideosFFmpeg_san4itos": BatchConvertVideosFFmpeg,
     "LoadVideoByPath_san4itos": LoadVideoByPath_san4itos,
+    "StartEncodeSession_san4itos": StartEncodeSession,
+    "AppendFramesToEncodeSession_san4itos": AppendFramesToEncodeSession,
+    "FinalizeEncodeSession_san4itos": FinalizeEncodeSession,
 }
 NODE_DISPLAY_NAME_MAPPINGS = {
     "SaveFramesToVideoFFmpeg_san4itos": "Save Images to Video (FFmpeg)",
     "ConvertVideoFFmpeg_san4itos": "Convert Video (FFmpeg)",
+    "BatchConvertVideosFFmpeg_san4itos": "Batch Convert Videos (FFmpeg)",
     "LoadVideoByPath_san4itos": "Load Video by Path",
+    "StartEncodeSession_san4itos": "Start Encode Session (FFmpeg)",
+    "AppendFramesToEncodeSession_san4itos": "Append Frames to Encode Session (FFmpeg)",
+    "FinalizeEncodeSession_san4itos": "Finalize Encode Session (FFmpeg)",
 }
\ No newline at end of file
@@ -0,0 +1,163 @@
+# output_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from .node_config import get_config_int, get_config_str
+from .node_logger import log_node_info, log_node_debug, log_node_warning
+
+CACHE_LOG_PREFIX = "OutputCache"
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".cache", "outputs")
+INDEX_FILE_NAME = "index.json"
+
+# У режимі "sampled" хешується кожен SAMPLE_STEP-й піксель по висоті та ширині кожного кадру
+SAMPLE_STEP = 4
+# Кадрів на один шматок при хешуванні (обмежує копіювання з GPU)
+HASH_CHUNK_FRAMES = 16
+
+try:
+    import xxhash
+    def _new_hasher():
+        return xxhash.xxh3_128()
+except ImportError:
+    # Без xxhash - blake2b зі стандартної бібліотеки (повільніший, але без залежностей)
+    def _new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+
+def _update_with_tensor(hasher, tensor):
+    hasher.update(f"{tuple(tensor.shape)}|{tensor.dtype}".encode())
+    for start in range(0, len(tensor), HASH_CHUNK_FRAMES):
+        chunk = tensor[start:start + HASH_CHUNK_FRAMES].detach().cpu().contiguous()
+        hasher.update(chunk.numpy())
+
+
+def compute_cache_key(images, audio, params, mode="sampled"):
+    """
+    Ключ результату: хеш кадрів (повний або вибірковий), аудіо та параметрів кодування.
+    Метадані (prompt) не входять у ключ, тому зміна лише промпта дає влучання в кеш.
+    """
+    hasher = _new_hasher()
+    hasher.update(f"{mode}|{json.dumps(params, default=str)}".encode())
+    if mode == "full":
+        _update_with_tensor(hasher, images)
+    else:
+        hasher.update(f"{tuple(images.shape)}".encode())
+        _update_with_tensor(hasher, images[:, ::SAMPLE_STEP, ::SAMPLE_STEP, :])
+    if audio is not None:
+        hasher.update(f"|audio|{audio.get('sample_rate')}".encode())
+        _update_with_tensor(hasher, audio["waveform"])
+    return hasher.hexdigest()
+
+
+def hash_metadata(metadata_dict):
+    return hashlib.blake2b(json.dumps(metadata_dict or {}, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def _link_or_copy(source, destination):
+    """Жорстке посилання (без копіювання даних), а якщо ФС не підтримує - звичайна копія."""
+    temp_path = f"{destination}.cache_tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+class OutputCache:
+    """
+    Кеш готових відео. Файли зберігаються в директорії кешу (жорсткими посиланнями на результат,
+    тож додаткове місце не займається, доки існує оригінал), а індекс у JSON впорядкований
+    від найдавніше використаного до найновішого і витісняється при перевищенні max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, INDEX_FILE_NAME)
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = OrderedDict(json.load(f))
+            except (OSError, ValueError):
+                self._index = OrderedDict()
+        return self._index
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self._index.items()), f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            log_node_warning(CACHE_LOG_PREFIX, f"Could not write cache index: {e}")
+
+    def lookup(self, key):
+        """Повертає запис кешу ({"file", "size", "metadata_hash", ...}) або None."""
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(os.path.join(self.directory, entry["file"])):
+                del index[key]
+                self._save_index()
+                return None
+            entry["last_used"] = time.time()
+            index.move_to_end(key)
+            self._save_index()
+            return dict(entry, path=os.path.join(self.directory, entry["file"]))
+
+    def materialize(self, entry, destination):
+        _link_or_copy(entry["path"], destination)
+
+    def store(self, key, source_path, metadata_hash):
+        if not os.path.exists(source_path):
+            return
+        extension = os.path.splitext(source_path)[1]
+        file_name = f"{key}{extension}"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            _link_or_copy(source_path, os.path.join(self.directory, file_name))
+            index = self._load_index()
+            index[key] = {"file": file_name, "size": os.path.getsize(source_path),
+                          "metadata_hash": metadata_hash, "last_used": time.time()}
+            index.move_to_end(key)
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._index.values())
+        while self._index and total > self.max_bytes:
+            key, entry = self._index.popitem(last=False)
+            total -= entry["size"]
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+            log_node_debug(CACHE_LOG_PREFIX, f"Evicted {entry['file']} ({entry['size']} bytes).")
+
+
+_OUTPUT_CACHE = None
+_OUTPUT_CACHE_LOCK = threading.Lock()
+
+
+def get_output_cache():
+    global _OUTPUT_CACHE
+    with _OUTPUT_CACHE_LOCK:
+        if _OUTPUT_CACHE is None:
+            directory = get_config_str("OUTPUT_CACHE", "directory", DEFAULT_CACHE_DIRECTORY)
+            if not os.path.isabs(directory):
+                directory = os.path.join(os.path.dirname(os.path.realpath(__file__)), directory)
+            max_bytes = get_config_int("OUTPUT_CACHE", "max_size_mb", 2048) * 1024 * 1024
+            _OUTPUT_CACHE = OutputCache(directory, max_bytes)
+            log_node_info(CACHE_LOG_PREFIX, f"Output cache at {directory} (limit {max_bytes // (1024 * 1024)} MB).")
+        return _OUTPUT_CACHE
@@ -0,0 +1,47 @@
+# test_ffmpeg_args.py
+import importlib
+import os
+import sys
+import types
+
+# Пакет вузла завантажується без __init__.py, щоб не імпортувати ComfyUI та torch
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if "san4itos_video" not in sys.modules:
+    _package = types.ModuleType("san4itos_video")
+    _package.__path__ = [_PACKAGE_DIR]
+    sys.modules["san4itos_video"] = _package
+ffmpeg_args = importlib.import_module("san4itos_video.ffmpeg_args")
+
+
+def test_value_starting_with_dash_is_kept():
+    options = ffmpeg_args.parse_options("-flags -global_header -preset fast", "test")
+    assert options == [("-flags", "-global_header"), ("-preset", "fast")]
+
+
+def test_negative_number_value():
+    assert ffmpeg_args.parse_options("-itsoffset -0.5", "test") == [("-itsoffset", "-0.5")]
+
+
+def test_bitexact_is_valueless():
+    options = ffmpeg_args.parse_options("-bitexact -crf 18", "test")
+    assert options == [("-bitexact", None), ("-crf", "18")]
+
+
+def test_trailing_flag_without_value_is_dropped():
+    assert ffmpeg_args.parse_options("-crf 18 -preset", "test") == [("-crf", "18")]
+
+
+def test_option_flags_skips_values():
+    assert ffmpeg_args.option_flags("-flags -global_header -bitexact -vcodec libx264") == {"-flags", "-bitexact", "-c:v"}
+
+
+def test_build_output_args_keeps_dash_value():
+    args = ffmpeg_args.build_output_args({"-c:v": "libx264", "-crf": 23}, "-flags -global_header -bitexact", "test")
+    assert args == ["-c:v", "libx264", "-crf", "23", "-flags", "-global_header", "-bitexact"]
+
+
+def test_split_mux_options_of_built_args():
+    args = ffmpeg_args.build_output_args({"-c:v": "libx264"}, "-flags -global_header -movflags +faststart -b:a 96k", "test")
+    encoder_options, mux_options = ffmpeg_args.split_mux_options(args, "test")
+    assert encoder_options == [("-c:v", "libx264"), ("-flags", "-global_header")]
+    assert mux_options == [("-movflags", "+faststart"), ("-b:a", "96k")]
@@ -0,0 +1,187 @@
+# video_decoder.py
+import os
+import subprocess
+import threading
+import types
+from .node_logger import log_node_info, log_node_debug
+
+DECODER_LOG_PREFIX = "VideoDecoder"
+
+
+class DecodeOptions:
+    """
+    Які кадри потрібні з відео: діапазон (start_frame, frame_count; 0 = до кінця), крок (stride)
+    та цільовий розмір (width/height; 0 = зберегти, якщо задано лише одне - пропорційно).
+    Усе виконує FFmpeg, тож у Python потрапляють лише потрібні кадри потрібного розміру.
+    """
+
+    def __init__(self, start_frame=0, frame_count=0, stride=1, width=0, height=0, chunk_size=16):
+        self.start_frame = max(0, int(start_frame))
+        self.frame_count = max(0, int(frame_count))
+        self.stride = max(1, int(stride))
+        self.width = max(0, int(width))
+        self.height = max(0, int(height))
+        self.chunk_size = max(1, int(chunk_size))
+
+    def is_default(self):
+        """True, якщо вибірка/масштабування не потрібні (повне відео в оригінальному розмірі)."""
+        return not (self.start_frame or self.frame_count or self.stride > 1 or self.width or self.height)
+
+    def output_size(self, info):
+        """Розмір кадрів на виході (ширина, висота) з урахуванням пропорцій джерела."""
+        src_w, src_h = info["width"], info["height"]
+        if self.width and self.height: return self.width, self.height
+        # Пропорційний розмір округлюється до парного, як '-2' у scale (непарний розмір не приймає yuv420p)
+        if self.width: return self.width, max(2, round(src_h * self.width / src_w / 2) * 2)
+        if self.height: return max(2, round(src_w * self.height / src_h / 2) * 2), self.height
+        return src_w, src_h
+
+    def input_args(self, info):
+        """Точний пошук до start_frame (-ss перед -i декодує і відкидає зайве)."""
+        if self.start_frame and info.get("fps"):
+            return ['-ss', f"{self.start_frame / info['fps']:.6f}"]
+        return []
+
+    def video_filters(self, info):
+        filters = []
+        # framestep зберігає мітки часу і ділить частоту кадрів на крок, тож кадри не дублюються
+        if self.stride > 1: filters.append(f"framestep={self.stride}")
+        if self.width or self.height:
+            width, height = self.output_size(info)
+            if (width, height) != (info["width"], info["height"]):
+                filters.append(f"scale={width}:{height}")
+        return filters
+
+    def output_args(self, info, count_frames=True):
+        """
+        Обмеження кількості кадрів (і тривалості, щоб аудіо обрізалося разом з відео).
+        count_frames=False - лише тривалість, коли подальший фільтр fps змінює кількість кадрів.
+        """
+        if not self.frame_count: return []
+        args = ['-frames:v', str(self.frame_count)] if count_frames or not info.get("fps") else []
+        if info.get("fps"):
+            args += ['-t', f"{self.frame_count * self.stride / info['fps']:.6f}"]
+        return args
+
+    def expected_frame_count(self, info):
+        """Оцінка кількості вибраних кадрів за даними аналізу файлу; None, якщо кількість невідома."""
+        total = info.get("frame_count")
+        if not total: return None
+        selected = -(-max(0, total - self.start_frame) // self.stride)
+        return min(selected, self.frame_count) if self.frame_count else selected
+
+    def frame_rate(self, info):
+        return (info.get("fps") or 0) / self.stride
+
+
+class ChunkedVideoReader:
+    """
+    Декодує відео через FFmpeg (-f rawvideo у stdout) і видає батчі IMAGE [N,H,W,3] float32
+    по chunk_size кадрів. У пам'яті одночасно тримається лише один батч.
+    """
+
+    def __init__(self, ffmpeg_path, filepath, info, options):
+        self.ffmpeg_path = ffmpeg_path
+        self.filepath = filepath
+        self.info = info
+        self.options = options
+        self.width, self.height = options.output_size(info)
+
+    def build_command(self):
+        cmd = [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error'] + self.options.input_args(self.info) + ['-i', self.filepath, '-map', '0:v:0']
+        filters = self.options.video_filters(self.info)
+        if filters: cmd += ['-vf', ','.join(filters)]
+        cmd += ['-frames:v', str(self.options.frame_count)] if self.options.frame_count else []
+        # Без passthrough автоматичний vsync для rawvideo - CFR, і кадри VFR джерел дублюються або відкидаються.
+        # -vsync, а не -fps_mode: останній з'явився лише у FFmpeg 5.1
+        cmd += ['-an', '-sn', '-vsync', 'passthrough', '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1']
+        return cmd
+
+    def __iter__(self):
+        import torch
+        frame_bytes = self.width * self.height * 3
+        cmd = self.build_command()
+        log_node_debug(DECODER_LOG_PREFIX, f"Executing ffmpeg: {' '.join(cmd)}")
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr_chunks = []
+        stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+        # Один буфер на весь процес: кожен батч копіюється у float32 тензор
+        buffer = bytearray(frame_bytes * self.options.chunk_size)
+        view = memoryview(buffer)
+        frames_read = 0
+        try:
+            while True:
+                filled = 0
+                while filled < len(buffer):
+                    count = process.stdout.readinto(view[filled:])
+                    if not count: break
+                    filled += count
+                frames = filled // frame_bytes
+                if frames == 0: break
+                batch = torch.frombuffer(buffer, dtype=torch.uint8, count=frames * frame_bytes)
+                yield batch.view(frames, self.height, self.width, 3).to(torch.float32).div_(255.0)
+                frames_read += frames
+                if filled < len(buffer): break
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            stderr_reader.join()
+        if process.returncode != 0 and frames_read == 0:
+            stderr = b"".join(stderr_chunks).decode('utf-8', errors='replace').strip()
+            raise RuntimeError(f"ffmpeg decode failed (code {process.returncode}): {stderr}")
+        log_node_info(DECODER_LOG_PREFIX, f"Decoded {frames_read} frames ({self.width}x{self.height}) from '{os.path.basename(self.filepath)}'.")
+
+    def read_all(self):
+        """
+        Усі вибрані кадри одним тензором [N,H,W,3]. Тензор виділяється заздалегідь за оцінкою
+        кількості кадрів і заповнюється батчами, тож пікове споживання пам'яті - результат плюс один батч.
+        """
+        import torch
+        expected = self.options.expected_frame_count(self.info)
+        if not expected:
+            batches = list(self)
+            return torch.cat(batches) if batches else torch.empty((0, self.height, self.width, 3))
+        images = torch.empty((expected, self.height, self.width, 3), dtype=torch.float32)
+        filled, overflow = 0, []
+        for batch in self:
+            take = min(len(batch), expected - filled)
+            images[filled:filled + take] = batch[:take]
+            filled += take
+            # Оцінка з тривалості може бути меншою за реальну кількість кадрів
+            if take < len(batch): overflow.append(batch[take:])
+        if overflow:
+            log_node_debug(DECODER_LOG_PREFIX, f"Decoded more frames than the estimated {expected}.")
+            return torch.cat([images] + overflow)
+        return images[:filled]
+
+
+def decode_audio(ffmpeg_path, filepath, info, options):
+    """Аудіо того ж фрагмента, що й кадри, у форматі AUDIO ComfyUI ({"waveform": [1,C,N], "sample_rate"})."""
+    import torch
+    if not info.get("audio_codec") or not info.get("sample_rate"):
+        return None
+    channels = info.get("audio_channels") or 2
+    cmd = [ffmpeg_path, '-hide_banner', '-loglevel', 'error'] + options.input_args(info) + ['-i', filepath, '-map', '0:a:0', '-vn']
+    if options.frame_count and info.get("fps"):
+        cmd += ['-t', f"{options.frame_count * options.stride / info['fps']:.6f}"]
+    cmd += ['-f', 'f32le', '-ac', str(channels), '-ar', str(info["sample_rate"]), 'pipe:1']
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0 or not result.stdout:
+        return None
+    data = bytearray(result.stdout[:len(result.stdout) // (4 * channels) * 4 * channels])
+    waveform = torch.frombuffer(data, dtype=torch.float32).view(-1, channels).t().unsqueeze(0).contiguous()
+    return {"waveform": waveform, "sample_rate": info["sample_rate"]}
+
+
+def make_video_components(images, audio, frame_rate):
+    """VideoComponents ComfyUI, якщо доступний; інакше об'єкт з тими ж атрибутами."""
+    from fractions import Fraction
+    frame_rate = Fraction(frame_rate).limit_denominator(1001)
+    try:
+        from comfy_api.util import VideoComponents
+        return VideoComponents(images=images, audio=audio, frame_rate=frame_rate)
+    except ImportError:
+        return types.SimpleNamespace(images=images, audio=audio, frame_rate=frame_rate, metadata=None)
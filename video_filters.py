@@ -0,0 +1,79 @@
+# video_filters.py
+import re
+from fractions import Fraction
+
+RESIZE_MODES = ["stretch", "fit (pad)", "fill (crop)"]
+SCALE_ALGORITHMS = ["bicubic", "bilinear", "lanczos", "spline", "area", "neighbor"]
+
+# Символи, що розділяють фільтри або задають мітки - у значеннях окремих параметрів вони зламали б граф
+_GRAPH_SYNTAX = re.compile(r"[,;\[\]]")
+
+
+class FilterOptions:
+    """
+    Обробка кадрів усередині FFmpeg перед кодуванням: обрізання (crop, синтаксис FFmpeg "w:h[:x:y]"),
+    зміна частоти кадрів (fps), масштабування з вибором алгоритму та вписування в точний розмір
+    з доповненням (fit) або обрізанням (fill). Якщо задано лише ширину чи висоту - пропорційно.
+    """
+
+    def __init__(self, crop="", width=0, height=0, resize_mode="stretch", algorithm="bicubic", pad_color="black", fps=0.0):
+        self.crop = (crop or "").strip()
+        self.width = max(0, int(width))
+        self.height = max(0, int(height))
+        self.resize_mode = resize_mode
+        self.algorithm = algorithm
+        self.pad_color = (pad_color or "black").strip()
+        self.fps = max(0.0, float(fps or 0))
+
+    def is_default(self):
+        return not (self.crop or self.width or self.height or self.fps)
+
+    def validate(self):
+        """ValueError, якщо параметри не можна безпечно вставити у ланцюжок фільтрів."""
+        for name, value in (("crop", self.crop), ("pad_color", self.pad_color)):
+            if _GRAPH_SYNTAX.search(value):
+                raise ValueError(f"Invalid {name} '{value}': ',', ';', '[' and ']' are not allowed.")
+        if self.resize_mode not in RESIZE_MODES:
+            raise ValueError(f"Unknown resize mode '{self.resize_mode}'.")
+        if self.algorithm not in SCALE_ALGORITHMS:
+            raise ValueError(f"Unknown resize algorithm '{self.algorithm}'.")
+
+    def filters(self):
+        filters = []
+        if self.crop: filters.append(f"crop={self.crop}")
+        # fps перед масштабуванням: при зниженні частоти зайві кадри відкидаються до scale
+        if self.fps: filters.append(f"fps={Fraction(self.fps).limit_denominator(1001)}")
+        if self.width and self.height:
+            size = f"{self.width}:{self.height}"
+            if self.resize_mode == "fit (pad)":
+                filters.append(f"scale={size}:force_original_aspect_ratio=decrease:flags={self.algorithm}")
+                filters.append(f"pad={size}:(ow-iw)/2:(oh-ih)/2:color={self.pad_color}")
+            elif self.resize_mode == "fill (crop)":
+                filters.append(f"scale={size}:force_original_aspect_ratio=increase:flags={self.algorithm}")
+                filters.append(f"crop={size}")
+            else:
+                filters.append(f"scale={size}:flags={self.algorithm}")
+        elif self.width or self.height:
+            # -2: пропорційний розмір, округлений до парного (потрібно для yuv420p)
+            filters.append(f"scale={self.width or -2}:{self.height or -2}:flags={self.algorithm}")
+        # scale змінює SAR, щоб зберегти пропорції кадру; тут потрібні квадратні пікселі
+        if self.width or self.height: filters.append("setsar=1")
+        return filters
+
+
+def chain_filters(pre_filters, user_graph):
+    """
+    Приєднує граф користувача (-vf з output_file_opt) після вбудованих фільтрів.
+    Лінійний ланцюжок дописується через кому; граф з кількома ланцюжками (';') отримує
+    вбудовані фільтри через проміжну мітку, якщо його перший вхід не позначено явно.
+    Повертає None, якщо безпечно об'єднати неможливо.
+    """
+    pre = ",".join(pre_filters)
+    user_graph = (user_graph or "").strip()
+    if not pre: return user_graph
+    if not user_graph: return pre
+    if ";" not in user_graph and not user_graph.startswith("["):
+        return f"{pre},{user_graph}"
+    if user_graph.startswith("["):
+        return None
+    return f"{pre}[san4itos_pre];[san4itos_pre]{user_graph}"
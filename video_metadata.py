@@ -0,0 +1,58 @@
+# video_metadata.py
+import base64
+import json
+import os
+import zlib
+from .node_logger import log_node_warning
+
+# embed - JSON у тезі comment (читається завантажувачем ComfyUI); compressed - comment="zlib:<base64>";
+# sidecar - JSON у файлі поруч з відео; off - без метаданих
+METADATA_MODES = ["embed", "compressed", "sidecar", "off"]
+COMPRESSED_PREFIX = "zlib:"
+
+# Символи, які у файлі FFMETADATA1 потрібно екранувати зворотною скісною рискою
+_FFMETADATA_SPECIAL = ("\\", "=", ";", "#", "\n")
+
+
+def metadata_tags(metadata_dict, mode="embed"):
+    """Глобальні теги, що вбудовуються у відео для заданого режиму (порожній словник - нічого)."""
+    if not metadata_dict or mode not in ("embed", "compressed"):
+        return {}
+    # Той самий формат comment=JSON, що очікує завантажувач метаданих ComfyUI
+    comment = json.dumps(metadata_dict)
+    if mode == "compressed":
+        comment = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(comment.encode("utf-8"), 9)).decode("ascii")
+    return {"comment": comment}
+
+
+def _escape(text):
+    for char in _FFMETADATA_SPECIAL:
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def write_ffmetadata_file(path, tags):
+    """Записує теги у файл формату FFMETADATA1 (вхід FFmpeg '-f ffmetadata')."""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(";FFMETADATA1\n")
+        for key, value in tags.items():
+            f.write(f"{_escape(key)}={_escape(str(value))}\n")
+    return path
+
+
+def sidecar_path(video_path):
+    return os.path.splitext(video_path)[0] + ".json"
+
+
+def write_sidecars(metadata_dict, video_paths, log_prefix):
+    """Записує метадані у JSON файл поруч з кожним відео (video.mp4 -> video.json)."""
+    if not metadata_dict:
+        return
+    for video_path in video_paths:
+        if not os.path.exists(video_path):
+            continue
+        try:
+            with open(sidecar_path(video_path), "w", encoding="utf-8") as f:
+                json.dump(metadata_dict, f)
+        except OSError as e:
+            log_node_warning(log_prefix, f"Could not write metadata sidecar for '{os.path.basename(video_path)}': {e}")